@@ -18,6 +18,8 @@
 
 import dlvhex
 
+import collections
+import inspect
 import logging
 
 #
@@ -31,18 +33,56 @@ TUPLE=dlvhex.TUPLE
 ExtSourceProperties=dlvhex.ExtSourceProperties
 
 class Environment:
+  '''
+  base class for environments of actions and external atoms
+
+  subclasses that set tracksChanges = True must call changed() whenever they modify the environment
+  (or override version()), then the results of external atoms are kept across iterations
+  as long as the parts of the environment they read do not change
+  (see dlvhex.ExtSourceProperties.setReadsEnvironment)
+  '''
+  # True = all modifications are reported with changed()
+  tracksChanges = False
+
   def __init__(self):
     pass
 
   def __str__(self):
     return ''
 
+  def changed(self, *parts):
+    '''
+    record that the given parts (names) of the environment changed (no parts = everything changed)
+    '''
+    # (subclasses do not need to call Environment.__init__)
+    counts = self.__dict__.setdefault('changeCounts', collections.Counter())
+    if len(parts) == 0:
+      counts[None] += 1
+    for part in parts:
+      counts[part] += 1
+
+  def version(self, part=None):
+    '''
+    returns a value that changes whenever the given part of the environment changes
+    (part = None: whenever something changes)
+    or None if changes are not tracked
+    '''
+    if not self.tracksChanges:
+      return None
+    counts = self.__dict__.get('changeCounts', collections.Counter())
+    if part is None:
+      return sum(counts.values())
+    return (counts[None], counts[part])
+
 # TODO if we just do addAtom=dlvhex.addAtom will it work the same? (global = global to module where method is registered?)
 #def addAtom(name, inargumentspec, outargumentnum, props=None):
 #  dlvhex.addAtom(name, inargumentspec, outargumentnum, props)
 addAtom=dlvhex.addAtom
 output=dlvhex.output
 outputUnknown=dlvhex.outputUnknown
+outputMany=dlvhex.outputMany
+outputManyIntegers=dlvhex.outputManyIntegers
+outputManyConstants=dlvhex.outputManyConstants
 learn=dlvhex.learn
 storeAtom=dlvhex.storeAtom
 storeOutputAtom=dlvhex.storeOutputAtom
@@ -56,7 +96,12 @@ def setEnvironment(env):
   logging.info("setting new environment of type %s, replacing environment of type %s", env.__class__, currentEnvironment.__class__)
   currentEnvironment = env
 
-def addAction(name, inargumentspec):
+def addAction(name, inargumentspec, parallel=True):
+    '''
+    register action with given input argument types
+    parallel: False = the action must not run concurrently with other actions (see acthex --action-threads)
+    (actions can be coroutine functions (async def))
+    '''
     global actions
     callingModule = dlvhex.callingModule
     if name in actions:
@@ -66,7 +111,7 @@ def addAction(name, inargumentspec):
         func = getattr(callingModule, name)
     except:
         raise Exception("could not get function for action {} in module {}".format(name, callingModule.__name__))
-    actions[name] = ActionHolder(name, inargumentspec, callingModule, func)
+    actions[name] = ActionHolder(name, inargumentspec, callingModule, func, parallel)
 
 def environment():
   global currentEnvironment
@@ -96,13 +141,17 @@ def cleanupActionCall():
   pass
 
 class ActionHolder:
-  def __init__(self, name, inspec, module, func):
+  def __init__(self, name, inspec, module, func, parallel=True):
     assert(isinstance(name, str))
     self.name = name
     assert(isinstance(inspec, tuple) and all([isinstance(x, int) for x in inspec]))
     self.inspec = inspec
     self.module = module
     self.func = func
+    # whether the action may run concurrently with other actions of the same priority
+    self.parallel = parallel
+    # whether func is a coroutine function (async def)
+    self.isasync = inspect.iscoroutinefunction(func)
 
 class IterationExit(Exception):
   pass
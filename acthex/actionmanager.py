@@ -5,6 +5,9 @@ import acthex
 import hexlite.auxiliary as aux
 import hexlite.ast.shallowparser as shp
 
+import asyncio
+import concurrent.futures
+import itertools
 import logging
 
 class ActionToBeExecuted:
@@ -44,17 +47,70 @@ def executeInternalAction(action):
   # action is not handled here
   return False
 
+def actionHolder(action):
+  if action.name not in acthex.actions:
+    raise KeyError("action name {} of action {} was not registered with acthex!".format(action.name, repr(action)))
+  # TODO check aholder.inspec
+  return acthex.actions[action.name]
+
 def executeAction(action):
-  aname = action.name
   if executeInternalAction(action):
     return
-  if aname not in acthex.actions:
-    raise KeyError("action name {} of action {} was not registered with acthex!".format(aname, repr(action)))
-  aholder = acthex.actions[aname]
-  # TODO check aholder.inspec
-  aholder.func(*action.arguments)
+  aholder = actionHolder(action)
+  if aholder.isasync:
+    asyncio.run(aholder.func(*action.arguments))
+  else:
+    aholder.func(*action.arguments)
+
+class ConcurrentActionExecutor:
+  '''
+  executes the actions of one priority level concurrently
+  * coroutine functions (async def) run together on an event loop
+  * other actions run in a thread pool with the given number of threads
+  * actions registered with parallel=False run alone after the others of their level
+  * internal actions (acthexStop) run last in their level
+  all actions of one priority level finish before the next level starts
+  '''
+  def __init__(self, threads):
+    self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix='acthex-action')
+    self.loop = asyncio.new_event_loop()
 
-def executeActions(model):
+  def close(self):
+    self.pool.shutdown()
+    self.loop.close()
+
+  def executeLevel(self, actions):
+    internal = [ a for a in actions if a.name == 'acthexStop' ]
+    holders = [ (a, actionHolder(a)) for a in actions if a.name != 'acthexStop' ]
+    parallel = [ (a, h) for a, h in holders if h.parallel ]
+    threaded = [ self.pool.submit(h.func, *a.arguments) for a, h in parallel if not h.isasync ]
+    # asynchronous actions run in this thread while the thread pool works
+    coroutines = [ h.func(*a.arguments) for a, h in parallel if h.isasync ]
+    async def gather():
+      return await asyncio.gather(*coroutines, return_exceptions=True)
+    results = self.loop.run_until_complete(gather()) if len(coroutines) > 0 else []
+    # barrier
+    concurrent.futures.wait(threaded)
+    for result in itertools.chain(results, [ f.exception() for f in threaded ]):
+      if isinstance(result, BaseException):
+        raise result
+    for a, h in holders:
+      if not h.parallel:
+        if h.isasync:
+          self.loop.run_until_complete(h.func(*a.arguments))
+        else:
+          h.func(*a.arguments)
+    for a in internal:
+      executeInternalAction(a)
+
+  def execute(self, schedule):
+    for prio, actions in itertools.groupby(schedule, key=lambda action: action.prio):
+      self.executeLevel(list(actions))
+
+def executeActions(model, executor=None):
+  '''
+  executor: ConcurrentActionExecutor or None (execute one action after the other)
+  '''
   # extract actions from model
   actions = extractActions(model)
   logging.debug("extracted actions: %s", actions)
@@ -62,5 +118,8 @@ def executeActions(model):
   schedule = buildSchedule(actions)
   logging.info("action schedule: %s", schedule)
   # execute on environment
+  if executor is not None:
+    executor.execute(schedule)
+    return
   for action in schedule:
     executeAction(action)
@@ -0,0 +1,183 @@
+# HEXLite-based solver for a fragment of the ActHEX language
+# Copyright (C) 2017-2019  Peter Schueller <schueller.p@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import logging
+
+import clingo
+
+import dlvhex
+import acthex
+import hexlite.auxiliary as aux
+import hexlite.clingobackend as clingobackend
+
+class EnvironmentVersions:
+  '''
+  finds out which external atoms may have other results than in the previous iteration
+  (see acthex.Environment.version and dlvhex.ExtSourceProperties.setReadsEnvironment)
+  '''
+  def __init__(self):
+    # key = eatom name, value = version of the parts of the environment it reads
+    self.versions = {}
+
+  @staticmethod
+  def versionOf(env, parts):
+    # returns None if it is not known whether the parts changed
+    if parts is not None and len(parts) == 0:
+      # does not read the environment
+      return ()
+    if parts is None:
+      version = env.version()
+    else:
+      version = tuple([ env.version(part) for part in sorted(parts) ])
+      if None in version:
+        version = None
+    if version is None:
+      return None
+    # (setEnvironment replaces the whole environment)
+    return (env, version)
+
+  def changedEAtoms(self):
+    '''
+    returns the set of names of external atoms that must be evaluated again in the current environment
+    '''
+    env = acthex.environment()
+    changed = set()
+    for name, holder in dlvhex.eatoms.items():
+      version = self.versionOf(env, holder.props.environmentParts)
+      if version is None or self.versions.get(name, None) != version:
+        changed.add(name)
+      self.versions[name] = version
+    logging.info('external atoms %s read a changed environment', sorted(changed))
+    return changed
+
+class EnvironmentGringoContext(clingobackend.GringoContext):
+  '''
+  gringo context that obtains outputs of external atoms from PersistentEngine.groundingCall
+  '''
+  class EnvironmentCall(clingobackend.GringoContext.ExternalAtomCall):
+    def __call__(self, *arguments):
+      logging.debug('EGC.EC(%s) called with %s', self.holder.name, repr(arguments))
+      return self.gringoOutput(self.context.engine.groundingCall(self.holder, arguments))
+  def __init__(self, engine, eaeval, control=None):
+    clingobackend.GringoContext.__init__(self, eaeval, control)
+    self.engine = engine
+  def __getattr__(self, attr):
+    return self.EnvironmentCall(self, dlvhex.eatoms[attr])
+
+class PersistentEngine:
+  '''
+  evaluates the program in all acthex iterations with one clingo control
+
+  * external atoms that would be evaluated in grounding are clingo externals
+    (see acthex.rewriter.EnvironmentEAtomHandler)
+  * for each external atom call in grounding, all output tuples seen so far get an external
+  * in each iteration, the calls of external atoms that read a changed environment are evaluated again
+    and the truth of the externals is updated
+  * the program is grounded again only if
+    - some call returns an output tuple that has no external yet, or
+    - external atoms evaluated during the search read a changed environment
+      (their nogoods may no longer be valid)
+  '''
+  def __init__(self, pcontext, rewritten, execution, config):
+    self.pcontext = pcontext
+    self.rewritten = rewritten
+    # clingobackend.Execution (shared with acthex.main)
+    self.execution = execution
+    self.config = config
+    self.control = None
+    self.flpchecker = None
+    # key = (eatom name, input tuple), value = set of output tuples with an external
+    self.domains = collections.defaultdict(set)
+    # key = (eatom name, input tuple), value = set of output tuples with a true external
+    self.truth = {}
+    # key = (eatom name, input tuple), value = set of output tuples in the current environment
+    self.evaluated = {}
+
+  def evaluate(self, holder, arguments):
+    # (not cached, the environment may have changed)
+    outKnownTrue, outUnknown, _ = clingobackend.EAtomEvaluator.evaluate(self.execution.eaeval, holder, arguments, [])
+    assert(len(outUnknown) == 0) # no partial evaluation for eatoms in grounding
+    return set([ tuple(t) for t in outKnownTrue ])
+
+  def external(self, key, tpl):
+    name, arguments = key
+    args = arguments+tpl
+    return clingo.Function(aux.predEnvironment(len(args), name), args)
+
+  def groundingCall(self, holder, arguments):
+    '''
+    called by gringo, returns all output tuples that need an external
+    '''
+    key = (holder.name, tuple(arguments))
+    if key not in self.evaluated:
+      self.evaluated[key] = self.evaluate(holder, arguments)
+    self.truth[key] = self.evaluated[key]
+    self.domains[key] |= self.evaluated[key]
+    return list(self.domains[key])
+
+  def updateExternals(self, changed):
+    '''
+    evaluates external atoms in changed in the current environment and assigns externals
+    returns False if the program must be grounded again
+    '''
+    if self.control is None:
+      return False
+    if any([ name in changed for name in self.pcontext.eatoms ]):
+      logging.info('grounding again because external atoms evaluated during search read a changed environment')
+      return False
+    for key, truth in self.truth.items():
+      if key[0] in changed:
+        self.evaluated[key] = self.evaluate(dlvhex.eatoms[key[0]], key[1])
+      else:
+        self.evaluated[key] = truth
+    if any([ not self.evaluated[key].issubset(self.domains[key]) for key in self.truth ]):
+      self.pcontext.stats.count('acthex-new-externals')
+      return False
+    for key, truth in self.truth.items():
+      current = self.evaluated[key]
+      for tpl in current ^ truth:
+        self.control.assign_external(self.external(key, tpl), tpl in current)
+        self.pcontext.stats.count('acthex-changed-externals')
+      self.truth[key] = current
+    return True
+
+  def ground(self):
+    logging.info('grounding program for persistent acthex engine')
+    self.pcontext.stats.count('acthex-grounding')
+    self.control = None
+    self.truth = {}
+    self.flpchecker = self.execution.flpChecker()
+    self.control = clingobackend.groundProgram(self.pcontext, self.rewritten, self.pcontext.groundingParts,
+      self.config, self.execution.cmdlineargs, self.execution.eaeval, self.flpchecker,
+      contextFactory=lambda eaeval, control: EnvironmentGringoContext(self, eaeval, control))
+    for key, truth in self.truth.items():
+      for tpl in truth:
+        self.control.assign_external(self.external(key, tpl), True)
+    # name of this propagator CSF = compatible set finder
+    self.control.register_propagator(self.execution.propagatorFactory('CSF'))
+
+  def solve(self, model_callbacks, changed):
+    '''
+    evaluates the program in the current environment
+    changed: names of external atoms that read a changed environment (see EnvironmentVersions)
+    '''
+    self.evaluated = {}
+    with self.pcontext.stats.context('grounding'):
+      if not self.updateExternals(changed):
+        self.ground()
+    return clingobackend.solveControl(self.pcontext, self.control, self.config, model_callbacks,
+      self.execution.ccontext, self.flpchecker)
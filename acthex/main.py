@@ -39,6 +39,7 @@ import dlvhex
 import acthex
 import acthex.rewriter
 import acthex.actionmanager
+import acthex.engine
 
 # other things we need here
 import os, argparse, traceback, pprint, logging
@@ -82,6 +83,10 @@ def interpretArguments(argv, config):
     help='Names of python modules to load as external atoms and actions (hexlite or acthex plugins).')
   parser.add_argument('--hidemodels', action='store_true', default=False,
     help='Do not print models encountered in each evaluation step.')
+  parser.add_argument('--incremental', action='store_true', default=False,
+    help='Keep one clingo control for all iterations, external atoms evaluated in grounding become clingo externals.')
+  parser.add_argument('--action-threads', metavar='N', action='store', default=0,
+    help='Execute actions of the same priority concurrently in N threads (asynchronous actions on an event loop), actions registered with parallel=False run alone. 0 = one action after the other.')
   config.add_common_arguments(parser)
   args = parser.parse_args(argv)
   if args.debug:
@@ -89,6 +94,15 @@ def interpretArguments(argv, config):
   config.process_arguments(args)
   # TODO derive acthex.Configuration from hexlite.Configuration?
   config.hidemodels = args.hidemodels
+  config.incremental = args.incremental
+  try:
+    config.action_threads = int(args.action_threads)
+  except:
+    raise ValueError("faulty action-threads argument '{}'".format(args.action_threads))
+  if config.incremental:
+    # (predicate inputs of external atoms evaluated in grounding must be facts, externals are not)
+    config.ground_evaluation = False
+    config.evaluation_units = False
   return args
 
 def setPaths(paths):
@@ -139,9 +153,22 @@ def main():
       # (per default, a dummy that does nothing is used)
     with pcontext.stats.context('rewriting'):
       hexlite.rewriter.classifyEAtomsInstallRewritingHandlers(pcontext)
+      if config.incremental:
+        acthex.rewriter.installEnvironmentHandlers(pcontext)
       pr = acthex.rewriter.ProgramRewriter(pcontext, program, plugins, config)
       rewritten, facts = pr.rewrite()
     stringifiedFacts = frozenset(ast.normalizeFacts(facts))
+    # one evaluator for all iterations, its cache is invalidated for external atoms that read a changed environment
+    with pcontext.stats.context('preparation'):
+      execution = hexlite.clingobackend.Execution(pcontext, plugins, config)
+    versions = acthex.engine.EnvironmentVersions()
+    engine = None
+    if config.incremental:
+      # (facts are part of the rewritten program)
+      engine = acthex.engine.PersistentEngine(pcontext, rewritten, execution, config)
+    executor = None
+    if config.action_threads > 0:
+      executor = acthex.actionmanager.ConcurrentActionExecutor(config.action_threads)
     try:
       for iteration in itertools.count():
         logging.info("acthex iteration %d", iteration)
@@ -154,12 +181,21 @@ def main():
         if len(dlvhex.modelCallbacks) > 0:
           # additional model callbacks
           callbacks += [ cb(stringifiedFacts, config) for cb in dlvhex.modelCallbacks ]
-        solvecode = hexlite.clingobackend.execute(pcontext, rewritten, facts, plugins, config, callbacks)
+        changed = versions.changedEAtoms()
+        execution.eaeval.invalidate(changed)
+        if engine is not None:
+          solvecode = engine.solve(callbacks, changed)
+        else:
+          solvecode = hexlite.clingobackend.execute(pcontext, rewritten, facts, plugins, config, callbacks, execution)
         # find and execute actions on environment
         with pcontext.stats.context('executing actions'):
-          acthex.actionmanager.executeActions(acthexcallback.optimal_model)
+          acthex.actionmanager.executeActions(acthexcallback.optimal_model, executor)
     except acthex.IterationExit:
       logging.info("got acthex iteration exit exception")
+    finally:
+      execution.close()
+      if executor is not None:
+        executor.close()
     # ignore code as dlvhex does
     code = 0
     pcontext.stats.display('final')
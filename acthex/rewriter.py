@@ -1,9 +1,67 @@
 import hexlite.rewriter
+import hexlite.ast as ast
 from hexlite.ast import shallowparser as shp
 import hexlite.auxiliary as aux
 
+import dlvhex
+
 import logging, pprint
 
+class EnvironmentEAtomHandler(hexlite.rewriter.EAtomHandlerBase):
+    '''
+    for acthex.engine.PersistentEngine:
+    transforms external atoms that would be evaluated in grounding into clingo externals
+      &foo[bar](bam,ban)
+    becomes
+      aux_e_3_foo(bar,bam,ban)
+    and the externals are declared for all outputs the external atom can have
+      #external aux_e_3_foo(bar,bam,ban) : SAFECONDITIONS, @foo(bar) = (bam,ban).
+    (the engine decides which outputs @foo returns and which externals are true)
+    '''
+    def __init__(self, pcontext, holder):
+        hexlite.rewriter.EAtomHandlerBase.__init__(self, pcontext, holder)
+
+    def transformEAtomInStatement(self, eatom, statement, safevars, safeconditions):
+        super().transformEAtomInStatement(eatom, statement, safevars, safeconditions)
+        args = eatom['inputs']+eatom['outputs']
+        envAtom = [ aux.predEnvironment(len(args), eatom['name']) ]
+        if len(args) > 0:
+            envAtom.append(shp.alist(args, left='(', right=')', sep=','))
+        # gringo external like in PureInstantiationEAtomHandler
+        call = [['@'+self.holder.name, shp.alist(eatom['inputs'], '(', ')', ',')], '=']
+        if len(eatom['outputs']) == 0:
+            call.append(1)
+        elif len(eatom['outputs']) == 1:
+            call.append(eatom['outputs'][0])
+        else:
+            call.append(shp.alist(eatom['outputs'], '(', ')', ','))
+        # conditions are the atoms in safeconditions and what uses only their variables
+        # (other conditions can use variables that become safe only later in the rule)
+        atoms = [ c for c in safeconditions if hexlite.rewriter.simpleAtomPredicate(c) is not None ]
+        bound = set(ast.findVariables(atoms))
+        conditions = [ c for c in safeconditions if c in atoms or (c[0] != 'not' and set(ast.findVariables(c)).issubset(bound)) ]
+        declaration = shp.alist([ ['#external']+envAtom, shp.alist(conditions+[call], sep=',') ], sep=':', right='.')
+        logging.debug('EEAH declaration={}'.format(shp.shallowprint(declaration)))
+        # replace eatom in statement
+        replacement = eatom['prefix'] + envAtom
+        posInStatement = statement[1].index(eatom['shallow'])
+        logging.info('EEAH replacing eatom '+shp.shallowprint(eatom['shallow'])+' by '+shp.shallowprint(replacement))
+        statement[1][posInStatement] = replacement
+        remainingEatoms = ast.deepCollect(statement, lambda x: isinstance(x, str) and x.startswith('&'))
+        if len(remainingEatoms) == 0:
+            return [declaration, statement]
+        else:
+            return [declaration]
+
+def installEnvironmentHandlers(pcontext):
+    '''
+    use EnvironmentEAtomHandler for all external atoms that are evaluated in grounding
+    (must be called after hexlite.rewriter.classifyEAtomsInstallRewritingHandlers)
+    '''
+    for name, holder in dlvhex.eatoms.items():
+        if isinstance(holder.executionHandler, hexlite.rewriter.PureInstantiationEAtomHandler):
+            holder.executionHandler = EnvironmentEAtomHandler(pcontext, holder)
+
 class ProgramRewriter(hexlite.rewriter.ProgramRewriter):
     def __init__(self, pcontext, shallowprogram, plugins, config):
         # rewrite shallowprogram:
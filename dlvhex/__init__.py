@@ -16,7 +16,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import logging, inspect
+import logging, inspect, contextvars
 
 #
 # used by plugins
@@ -25,6 +25,10 @@ import logging, inspect
 CONSTANT = 1
 PREDICATE = 2
 TUPLE = 3
+# only for outputs (CONSTANT is also used for outputs)
+INTEGER = 4
+STRING = 5
+TERM = 6
 
 class StoreAtomException(Exception):
   '''
@@ -39,15 +43,63 @@ class ExtSourceProperties:
   def __init__(self):
     self.provides_partial = False
     self.doInputOutputLearning = True
+    self.deterministic = False
+    self.threadsafe = False
+    # indices of predicate input arguments where the external atom is monotonic/antimonotonic
+    self.monotonicInputs = set()
+    self.antimonotonicInputs = set()
+    # scheduling of evaluations on partial assignments (None = no restriction, see setPartialEvaluation*)
+    self.partialThreshold = None
+    self.partialDecisionLevels = None
+    self.partialBackoff = None
+    # estimate of the truth of ground external atoms for decisions of the solver (None = no hint, see setDecisionHint)
+    self.decisionHint = None
+    # parts of the acthex environment that are read (None = the whole environment, see setReadsEnvironment)
+    self.environmentParts = None
   def setProvidesPartialAnswer(self, provides_partial):
     self.provides_partial = provides_partial
+  def setPartialEvaluationThreshold(self, newlyAssigned):
+    # evaluate on a partial assignment only if at least newlyAssigned predicate inputs were assigned since the last partial evaluation
+    self.partialThreshold = newlyAssigned
+  def setPartialEvaluationDecisionLevels(self, levels):
+    # evaluate on a partial assignment only at these decision levels (a container, e.g., range(0, 10) or a set)
+    self.partialDecisionLevels = levels
+  def setPartialEvaluationBackoff(self, maximum=64):
+    # after a partial evaluation that gave only unknown output tuples, skip the next 1, 2, 4, ... (at most maximum) partial evaluations
+    self.partialBackoff = maximum
   def addFiniteOutputDomain(self, argidx):
     pass
+  def addMonotonicInputPredicate(self, argidx):
+    # more true atoms in this input predicate never make output tuples false
+    self.monotonicInputs.add(argidx)
+  def addAntimonotonicInputPredicate(self, argidx):
+    # more true atoms in this input predicate never make output tuples true
+    self.antimonotonicInputs.add(argidx)
 
   def setDoInputOutputLearning(self, doInputOutputLearning):
     # True = add nogood for input/output behavior of external atom
     # set this to False if the external atom creates own nogoods that cut the search space much better than naive nogoods created in hexlite
     self.doInputOutputLearning = doInputOutputLearning
+
+  def setDeterministic(self, deterministic=True):
+    # True = output depends only on input tuple and predicate inputs (and on the plugin version in module attribute __version__)
+    # results of such external atoms can be stored in a persistent cache across runs
+    self.deterministic = deterministic
+
+  def setThreadSafe(self, threadsafe=True):
+    # True = the external atom function can be called concurrently from several threads
+    # (e.g., it does not modify global state of the plugin), this permits concurrent evaluation (--eatom-threads)
+    self.threadsafe = threadsafe
+  def setDecisionHint(self, hint):
+    # hint(inputs, outputs) gets the input tuple and output tuple (tuples of IDs) of a ground external atom
+    # and returns the estimated probability that this external atom is true, or None (no estimate)
+    # (used with --eatom-heuristic, it is called outside of external atom evaluations)
+    self.decisionHint = hint
+  def setReadsEnvironment(self, parts=None):
+    # (acthex) the external atom reads only the given parts of the environment (a container of part names, see acthex.Environment)
+    # an empty container declares that the external atom does not read the environment
+    # results of external atoms are kept in the cache across acthex iterations until a part they read changes
+    self.environmentParts = None if parts is None else frozenset(parts)
   def __getattr__(self, name):
     class Generic:
       def __init__(self, name):
@@ -57,7 +109,16 @@ class ExtSourceProperties:
           self.name, ','.join([repr(x) for x in arguments])))
     return Generic(name)
 
-def addAtom(name, inargumentspec, outargumentnum, props=None):
+def addAtom(name, inargumentspec, outargumentnum, props=None, outargumenttypes=None):
+  '''
+  register external atom with given input argument types (CONSTANT, PREDICATE, TUPLE) and number of output arguments
+  outargumenttypes (optional): tuple with one type per output argument for direct conversion of output values
+  * INTEGER: Python int
+  * CONSTANT: constant as string (e.g., 'abc')
+  * STRING: string content without quotes (e.g., 'a b' becomes "a b")
+  * TERM: any term (type is detected from the value, strings are parsed, this is the default)
+  (outputs that are IDs are always used directly)
+  '''
   global callingModule, eatoms
   if name in eatoms:
     raise Exception("atom with name {} registered by module {} already defined by module {}!".format(
@@ -68,7 +129,12 @@ def addAtom(name, inargumentspec, outargumentnum, props=None):
     raise Exception("could not get function for external atom {} in module {}".format(name, callingModule.__name__))
   if props is None:
     props = ExtSourceProperties()
-  eatoms[name] = ExternalAtomHolder(name, inargumentspec, outargumentnum, props, callingModule, func)
+  if outargumenttypes is not None:
+    outargumenttypes = tuple(outargumenttypes)
+    if len(outargumenttypes) != outargumentnum or any([ t not in [INTEGER, CONSTANT, STRING, TERM] for t in outargumenttypes ]):
+      raise Exception("external atom {} has {} output arguments but got invalid output argument types {}".format(
+        name, outargumentnum, repr(outargumenttypes)))
+  eatoms[name] = ExternalAtomHolder(name, inargumentspec, outargumentnum, props, callingModule, func, outargumenttypes)
 
 def output(tuple_):
   assert(isinstance(tuple_, tuple)) # because we store it in a set
@@ -79,6 +145,31 @@ def outputUnknown(tuple_):
   assert(isinstance(tuple_, tuple)) # because we store it in a set
   currentEvaluation().outputUnknown.add(tuple_)
 
+def outputMany(tuples=None, columns=None, valuetype=None):
+  '''
+  output many tuples (known to be true) at once, the backend converts them in bulk
+  * tuples: iterable of tuples, or
+  * columns: sequence with one sequence (e.g., list or NumPy array) of values per output argument, all of equal length
+  * valuetype: INTEGER (all values are integers) or CONSTANT (all values are constants given as strings)
+    or None (values are converted like in output())
+  '''
+  if columns is not None:
+    assert(tuples is None)
+    # NumPy arrays are converted to lists of Python values
+    columns = [ c.tolist() if hasattr(c, 'tolist') else c for c in columns ]
+    tuples = list(zip(*columns))
+  elif not isinstance(tuples, list):
+    tuples = [ tuple(t) for t in tuples ]
+  currentEvaluation().outputBulk.append( (valuetype, tuples) )
+
+def outputManyIntegers(tuples=None, columns=None):
+  # outputMany() where all values are integers
+  outputMany(tuples, columns, INTEGER)
+
+def outputManyConstants(tuples=None, columns=None):
+  # outputMany() where all values are constants (given as strings)
+  outputMany(tuples, columns, CONSTANT)
+
 def learn(nogood):
   # add nogood (given as IDs) to search process
   currentEvaluation().backend.learn(nogood)
@@ -122,6 +213,14 @@ def getInputAtoms():
 def getTrueInputAtoms():
   return [ i for i in currentEvaluation().input if i.isTrue() ]
 
+def getInterpretation():
+  # obtain the Interpretation of the predicate inputs of the currently called external atom
+  # (created once per call, use this instead of repeatedly iterating over getInputAtoms())
+  evaluation = currentEvaluation()
+  if evaluation.interpretation is None:
+    evaluation.interpretation = evaluation.backend.interpretation()
+  return evaluation.interpretation
+
 def registerModelCallbackClass(handler):
   '''
   register a model callback class (see hexlite.modelcallbacks)
@@ -142,6 +241,10 @@ class Backend:
   def learn(self, nogood):
     logging.warning("not implemented: Backend::learn")
 
+  def interpretation(self):
+    # generic implementation based on the ID interface
+    return Interpretation(currentEvaluation().input)
+
   def storeAtom(self, tpl):
     logging.warning("not implemented: Backend::storeAtom")
     return None
@@ -169,25 +272,38 @@ class CurrentExternalAtomEvaluation:
   def __init__(self):
     self.reset()
 
-  def reset(self, inputTuple=(), inputs=frozenset(), backend=Backend(), holder=None):
+  def reset(self, inputTuple=(), inputs=frozenset(), backend=Backend(), holder=None, trackAccess=False):
     # current input tuple (also passed directly to function, but for storeOutputAtom we need to know this, too)
     self.inputTuple = inputTuple
-    # frozen set of ID objects that are predicate input for the currently called external atom
+    # collection (tuple or frozenset) of ID objects that are predicate input for the currently called external atom
     # None if eatom does not take predicate input
     self.input = inputs
     # tuples returned by the current/previously called external atom
     self.outputKnownTrue = set()
     self.outputUnknown = set()
+    # list of (type, list of tuples) given to outputMany() (known to be true)
+    self.outputBulk = []
     # object realizing the Backend interface for the currently calling backend
     self.backend = backend
     # currently processed eatom holder
     self.holder = holder
+    # backend-specific identifiers of input atoms whose truth value was read by the external atom
+    # None if the backend does not track this
+    self.accessed = set() if trackAccess else None
+    # Interpretation of predicate inputs (created on demand by getInterpretation())
+    self.interpretation = None
 
 # all data relevant to external atom evaluation (dlvhex.* API)
-currentEvaluationStorage = CurrentExternalAtomEvaluation()
+# (one CurrentExternalAtomEvaluation per thread and per asyncio task,
+# because the backend may evaluate in several solver threads and overlap asynchronous external atoms)
+currentEvaluationVar = contextvars.ContextVar('currentEvaluation', default=None)
 
 def currentEvaluation():
-  return currentEvaluationStorage
+  evaluation = currentEvaluationVar.get()
+  if evaluation is None:
+    evaluation = CurrentExternalAtomEvaluation()
+    currentEvaluationVar.set(evaluation)
+  return evaluation
 
 # called by engine before calling <pluginmodule>.register()
 def startRegistration(caller):
@@ -195,29 +311,39 @@ def startRegistration(caller):
   callingModule = caller
 
 # called by engine before calling external atom function
-def startExternalAtomCall(input_tuple, inputs, backend, holder):
+def startExternalAtomCall(input_tuple, inputs, backend, holder, trackAccess=False):
   '''
-  inputs: frozenset of all ClingoIDs that are relevant to the current eatom evaluation as predicate inputs
+  inputs: collection (without duplicates) of all ClingoIDs that are relevant to the current eatom evaluation as predicate inputs
+  trackAccess: whether the backend records which inputs are read (in currentEvaluation().accessed)
   '''
-  currentEvaluation().reset(input_tuple, inputs, backend, holder)
-  logging.debug("starting evaluation %s %s", tuple([ str(x) for x in input_tuple ]), sorted([ str(x) for x in inputs if x.isTrue() ]))
+  if logging.getLogger().isEnabledFor(logging.DEBUG):
+    logging.debug("starting evaluation %s %s", tuple([ str(x) for x in input_tuple ]), sorted([ str(x) for x in inputs if x.isTrue() ]))
+  # a new object (an asyncio task can share the object of its parent context)
+  evaluation = CurrentExternalAtomEvaluation()
+  evaluation.reset(input_tuple, inputs, backend, holder, trackAccess)
+  currentEvaluationVar.set(evaluation)
 
 # called by engine after calling external atom function
 def cleanupExternalAtomCall():
   currentEvaluation().reset()
 
 class ExternalAtomHolder:
-  def __init__(self, name, inspec, outnum, props, module, func):
+  def __init__(self, name, inspec, outnum, props, module, func, outtypes=None):
     assert(isinstance(name, str))
     self.name = name
     assert(isinstance(inspec, tuple) and all([isinstance(x, int) for x in inspec]))
     self.inspec = inspec
     assert(isinstance(outnum, int))
     self.outnum = outnum
+    # tuple of output types or None (all outputs are TERM)
+    assert(outtypes is None or len(outtypes) == outnum)
+    self.outtypes = outtypes
     assert(isinstance(props, ExtSourceProperties))
     self.props = props
     self.module = module
     self.func = func
+    # whether func is a coroutine function (async def)
+    self.isasync = inspect.iscoroutinefunction(func)
     # this will be set by the engine
     # this is for rewriting
     self.executionHandler = None
@@ -225,7 +351,10 @@ class ExternalAtomHolder:
 _specToString = {
   TUPLE: 'TUPLE',
   PREDICATE: 'PREDICATE',
-  CONSTANT: 'CONSTANT'
+  CONSTANT: 'CONSTANT',
+  INTEGER: 'INTEGER',
+  STRING: 'STRING',
+  TERM: 'TERM'
 }
 def humanReadableSpec(spec):
   return [ _specToString[s] for s in spec ]
@@ -236,6 +365,9 @@ class ID:
 
   the name is historic from the 64 bit ID datatype in dlvhex
   '''
+  # permit subclasses without instance dictionary
+  __slots__ = ()
+
   def negate(self):
     raise NotImplementedError()
   def value(self):
@@ -257,6 +389,47 @@ class ID:
   def __repr__(self):
     raise NotImplementedError()
 
+class Interpretation:
+  '''
+  truth values of the predicate inputs of one external atom call, grouped by predicate
+
+  true(p), false(p), and unknown(p) return frozensets of argument tuples (tuples of IDs)
+  of atoms with predicate p (an ID or a string) that are true, false, and unknown (in partial evaluation)
+
+  obtain with getInterpretation(), the object is only valid during the call
+  '''
+  def __init__(self, inputs):
+    # key = predicate name, value = list of (atom ID, tuple of argument IDs)
+    self.atoms = {}
+    for x in inputs:
+      tup = x.tuple()
+      self.atoms.setdefault(tup[0].value(), []).append( (x, tup[1:]) )
+    # key = predicate name, value = (true, false, unknown)
+    self.values = {}
+
+  def true(self, pred):
+    return self._values(pred)[0]
+
+  def false(self, pred):
+    return self._values(pred)[1]
+
+  def unknown(self, pred):
+    return self._values(pred)[2]
+
+  def _values(self, pred):
+    name = pred if isinstance(pred, str) else pred.value()
+    if name not in self.values:
+      true, false, unknown = [], [], []
+      for x, args in self.atoms.get(name, []):
+        if x.isTrue():
+          true.append(args)
+        elif x.isFalse():
+          false.append(args)
+        else:
+          unknown.append(args)
+      self.values[name] = (frozenset(true), frozenset(false), frozenset(unknown))
+    return self.values[name]
+
 class Model:
   def __init__(self, atoms, cost, is_optimal):
     assert(isinstance(atoms, frozenset))
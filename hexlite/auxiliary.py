@@ -46,6 +46,11 @@ class Aux:
 
   # for acthex rewriting
   ACTREPL = PREFIX+'act'
+  # clingo externals for external atoms evaluated in grounding (acthex.engine)
+  ENVIRONMENT = PREFIX+'e'
+
+  # program parts for multi-shot grounding (rewriter.GroundingStrata)
+  STRATUM = PREFIX+'stratum'
 
 def predEAtomRelevance(arity, eatomname):
   return Aux.EARELV+'_'+str(arity)+'_'+eatomname
@@ -55,3 +60,6 @@ def predEAtomTruth(arity, eatomname):
 
 def predActhexAction(actionname):
   return Aux.ACTREPL+'_'+actionname
+
+def predEnvironment(arity, eatomname):
+  return Aux.ENVIRONMENT+'_'+str(arity)+'_'+eatomname
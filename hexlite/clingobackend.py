@@ -24,6 +24,13 @@ import itertools
 import pprint
 import traceback
 import json
+import array
+import threading
+import functools
+import contextlib
+import contextvars
+import concurrent.futures
+import asyncio
 
 import dlvhex
 
@@ -32,6 +39,8 @@ from . import auxiliary as aux
 from .ast import shallowparser as shp
 from . import explicitflpcheck as flp
 from . import modelcallback
+from . import persistentcache
+from . import eatomprocesses
 
 from .clingogroundprogramprinter import GroundProgramPrinter
 
@@ -39,16 +48,72 @@ from .clingogroundprogramprinter import GroundProgramPrinter
 import clingo
 
 
+# maximum number of entries in interning tables for terms exchanged with external atoms
+INTERN_TABLE_SIZE = 65536
+
+@functools.lru_cache(maxsize=INTERN_TABLE_SIZE)
+def symbolFromString(term):
+  '''
+  convert a string given by an external atom to a clingo symbol (cached, symbols are immutable)
+  '''
+  if term[0] == '"':
+    return clingo.String(term[1:-1])
+  try:
+    return clingo.parse_term(term)
+  except:
+    logging.warning("cannot parse external atom term {} with clingo! (creating a string out of it)".format(repr(term)))
+    return clingo.String(str(term))
+
 class ClaspContext:
   '''
   context within the propagator
   * clasp context with PropagateControl object
   * ClingoPropagator object that contains, e.g., propagation init symbol information
+
+  the context is separate for each thread (clasp can run several solver threads)
+  the evaluation context (verification, nogoodSink) is separate for each asyncio task
+  (several asynchronous external atoms can be evaluated concurrently in one thread)
   '''
   def __init__(self):
-    self.propcontrol = None
-    self.propagator = None
-    
+    self.local = threading.local()
+    self.currentVerification = contextvars.ContextVar('verification', default=None)
+    self.currentNogoodSink = contextvars.ContextVar('nogoodSink', default=None)
+    # interning table: symbol -> ClingoID of a term (not an atom, so it has no literal)
+    self.termID = functools.lru_cache(maxsize=INTERN_TABLE_SIZE)(
+      lambda sym: ClingoID(self, SymLit(sym, None)))
+
+  @property
+  def propcontrol(self):
+    return getattr(self.local, 'propcontrol', None)
+
+  @property
+  def propagator(self):
+    return getattr(self.local, 'propagator', None)
+
+  @property
+  def verification(self):
+    # EAtomVerification whose external atom is currently evaluated in this thread/task (or None)
+    return self.currentVerification.get()
+
+  @property
+  def nogoodSink(self):
+    # list that collects nogoods learned in the current evaluation in this thread/task
+    # (None = record them in the ThreadState of the solver thread)
+    return self.currentNogoodSink.get()
+
+  @contextlib.contextmanager
+  def evaluating(self, verification, nogoodSink=None):
+    '''
+    context for evaluating the external atom of verification in this thread/task
+    '''
+    vtoken = self.currentVerification.set(verification)
+    stoken = self.currentNogoodSink.set(nogoodSink)
+    try:
+      yield
+    finally:
+      self.currentNogoodSink.reset(stoken)
+      self.currentVerification.reset(vtoken)
+
   def __call__(self, control, propagator):
     '''
     initialize context with control object
@@ -56,15 +121,15 @@ class ClaspContext:
     assert(self.propcontrol == None)
     assert(control != None)
     assert(isinstance(control, clingo.PropagateControl))
-    self.propcontrol = control
+    self.local.propcontrol = control
     assert(isinstance(propagator, ClingoPropagator))
-    self.propagator = propagator
+    self.local.propagator = propagator
     return self
   def __enter__(self):
     pass
   def __exit__(self, type, value, traceback):
-    self.propcontrol = None
-    self.propagator = None
+    self.local.propcontrol = None
+    self.local.propagator = None
 
 class SymLit:
   '''
@@ -79,6 +144,8 @@ class SymLit:
   * sym is used as a non-predicate-input to an external atom (TODO ensure this is always true)
   * TODO document other cases
   '''
+  __slots__ = ('sym', 'lit')
+
   def __init__(self, sym, lit):
     self.sym = sym
     #if lit is None:
@@ -94,11 +161,14 @@ class SymLit:
 
 class ClingoID(dlvhex.ID):
   # the ID class as passed to plugins, from view of Clingo backend
+  __slots__ = ('ccontext', 'symlit', '__value')
+
   def __init__(self, ccontext, symlit):
     assert(isinstance(ccontext, ClaspContext))
     self.ccontext = ccontext
     self.symlit = symlit
-    self.__value = str(symlit.sym)
+    # string representation (created on demand)
+    self.__value = None
 
   def negate(self):
     if self.symlit.sym.type != clingo.SymbolType.Function:
@@ -108,13 +178,15 @@ class ClingoID(dlvhex.ID):
       -self.symlit.lit))
 
   def value(self):
+    if self.__value is None:
+      self.__value = str(self.symlit.sym)
     return self.__value
 
   def intValue(self):
     if self.symlit.sym.type == clingo.SymbolType.Number:
       return self.symlit.sym.number
     else:
-      raise Exception('intValue called on ID {} which is not a number!'.format(self.__value))
+      raise Exception('intValue called on ID {} which is not a number!'.format(self.value()))
 
   def isPositive(self):
     return self.symlit.sym.positive
@@ -122,23 +194,27 @@ class ClingoID(dlvhex.ID):
   def isTrue(self):
     if not self.symlit.lit:
       raise Exception("cannot call isTrue on term that is not an atom")
+    self.__recordAccess()
     return self.__assignment().is_true(self.symlit.lit)
 
   def isFalse(self):
     if not self.symlit.lit:
       raise Exception("cannot call isFalse on term that is not an atom")
+    self.__recordAccess()
     return self.__assignment().is_false(self.symlit.lit)
 
   def isAssigned(self):
     if not self.symlit.lit:
       raise Exception("cannot call isAssigned on term that is not an atom")
+    self.__recordAccess()
     return self.__assignment().value(self.symlit.lit) != None
 
   def isInteger(self):
     return self.symlit.sym.type == clingo.SymbolType.Number
 
   def tuple(self):
-    tup = tuple([ ClingoID(self.ccontext, SymLit(sym, None)) for sym in
+    termID = self.ccontext.termID
+    tup = tuple([ termID(sym) for sym in
                   [clingo.Function(self.symlit.sym.name)]+self.symlit.sym.arguments])
     return tup
 
@@ -148,23 +224,25 @@ class ClingoID(dlvhex.ID):
     fails if this ClingoID does not hold a constant
     '''
     if self.symlit.sym.type != clingo.SymbolType.Function or self.symlit.sym.arguments != []:
-      raise Exception("cannot call extension() on term that is not a constant. was called on {}".format(self.__value))
+      raise Exception("cannot call extension() on term that is not a constant. was called on {}".format(self.value()))
     # extract all true atoms with matching predicate name
-    ret_atoms = [
-      x for x in dlvhex.getTrueInputAtoms()
-      if x.symlit.sym.type == clingo.SymbolType.Function and x.symlit.sym.name == self.__value ]
-    # convert into tuples of ClingoIDs without literal (they are terms, not atoms)
-    ret = frozenset([
-      tuple([ClingoID(self.ccontext, SymLit(term, None)) for term in x.symlit.sym.arguments])
-      for x in ret_atoms ])
+    # (check truth only for matching atoms, so that only these count as read inputs)
+    # (the interpretation is computed once per external atom call)
+    ret = dlvhex.getInterpretation().true(self.value())
     #logging.warning("extension of {} returned {}".format(self.__value, repr(ret)))
     return ret
 
   def __assignment(self):
     return self.ccontext.propcontrol.assignment
 
+  def __recordAccess(self):
+    # remember that the currently evaluated external atom read this input
+    accessed = dlvhex.currentEvaluation().accessed
+    if accessed is not None:
+      accessed.add(self.symlit.sym)
+
   def __str__(self):
-    return self.__value
+    return self.value()
 
   def __repr__(self):
     return "ClingoID({})/{}".format(str(self), self.symlit.lit)
@@ -185,6 +263,40 @@ class ClingoID(dlvhex.ID):
   def __getattr__(self, name):
     raise Exception("not (yet) implemented: ClingoID.{}".format(name))
 
+class ClingoFactID(ClingoID):
+  '''
+  ID of an atom that is a fact after grounding
+  (predicate input of an external atom that is evaluated in grounding, there is no solver literal)
+  '''
+  __slots__ = ()
+
+  def isTrue(self):
+    return True
+
+  def isFalse(self):
+    return False
+
+  def isAssigned(self):
+    return True
+
+def typedConverter(constructor):
+  '''
+  conversion of an output value with declared type: IDs are used directly, other values are given to constructor
+  '''
+  def convert(val):
+    if isinstance(val, ClingoID):
+      return val.symlit.sym
+    return constructor(val)
+  return convert
+
+# key = output argument type, value = conversion from output value to clingo symbol
+# (dlvhex.TERM uses EAtomEvaluator.hex2clingo)
+TYPED_CONVERTERS = {
+  dlvhex.INTEGER: typedConverter(clingo.Number),
+  dlvhex.CONSTANT: typedConverter(clingo.Function),
+  dlvhex.STRING: typedConverter(clingo.String),
+}
+
 class EAtomEvaluator(dlvhex.Backend):
   '''
   Clingo-backend-specific evaluation of external atoms implemented in Python
@@ -194,29 +306,24 @@ class EAtomEvaluator(dlvhex.Backend):
 
   This is one object that evaluates all external atoms in the context of a clasp context.
   '''
-  def __init__(self, config, claspcontext, stats):
+  def __init__(self, config, claspcontext, stats, workers=None):
     assert(isinstance(claspcontext, ClaspContext))
     self.config = config
     self.ccontext = claspcontext
     self.stats = stats
-
-    # set of all replacement atom symbols so that we can detect them in nogoods
-    # this is initialized by ClingoPropagator.init
-    self.replacementAtoms = set()
-
-    # key = replacement symbol
-    # value = single EAtomVerification in ClingoPropagator.eatomVerifications.values()
-    # this is initialized by ClingoPropagator.init
-    self.eatomVerificationsByReplacement = {}
-
-    # list of nogoods that still need to be added
-    # (in an external atom call, dlvhex.learn() collects nogoods here and adds them later)
-    self.nogoodsToAdd = set()
+    # eatomprocesses.WorkerPool for external atoms of some plugins (or None)
+    self.workers = workers
+    # key = eatom name, value = function converting an output tuple (see outputConverter)
+    self.outputConverters = {}
+    # event loop for asynchronous external atoms (one per thread, created on demand)
+    self.loops = threading.local()
+    self.allLoops = []
+    self.loopsLock = threading.Lock()
 
   def clingo2hex(self, term):
     assert(isinstance(term, clingo.Symbol))
     #logging.debug("convertClingoToHex got {} with type {}".format(repr(term), term.type))
-    return ClingoID(self.ccontext, SymLit(term, None))
+    return self.ccontext.termID(term)
     #if term.type is clingo.SymbolType.Number:
     #  ret = term.number
     #elif term.type in [clingo.SymbolType.String, clingo.SymbolType.Function]:
@@ -230,20 +337,66 @@ class EAtomEvaluator(dlvhex.Backend):
     if isinstance(term, ClingoID):
       return term.symlit.sym
     elif isinstance(term, str):
-      if term[0] == '"':
-        ret = clingo.String(term[1:-1])
-      else:
-        try:
-          ret = clingo.parse_term(term)
-        except:
-          logging.warning("cannot parse external atom term {} with clingo! (creating a string out of it)".format(repr(term)))
-          ret = clingo.String(str(term))
+      ret = symbolFromString(term)
     elif isinstance(term, int):
       ret = clingo.Number(term)
     else:
       raise Exception("cannot convert external atom term {} to clingo term!".format(repr(term)))
     return ret
 
+  def outputConverter(self, holder):
+    '''
+    returns a function that converts one output tuple of the external atom from dlvhex to clingo
+    (using the declared output argument types)
+    '''
+    convert = self.outputConverters.get(holder.name, None)
+    if convert is None:
+      hex2clingo = self.hex2clingo
+      if holder.outtypes is None or all([ t == dlvhex.TERM for t in holder.outtypes ]):
+        convert = lambda _tuple: tuple([ hex2clingo(val) for val in _tuple ])
+      else:
+        converters = [ TYPED_CONVERTERS.get(t, hex2clingo) for t in holder.outtypes ]
+        convert = lambda _tuple: tuple([ c(val) for c, val in zip(converters, _tuple) ])
+      self.outputConverters[holder.name] = convert
+    return convert
+
+  def hex2clingoBulk(self, holder, outtype, tuples):
+    '''
+    convert a list of tuples given to dlvhex.outputMany() with all values of type outtype
+    (or None = use declared output argument types of the external atom)
+    '''
+    if outtype == dlvhex.INTEGER:
+      Number = clingo.Number
+      return [ tuple([ Number(int(val)) for val in _tuple ]) for _tuple in tuples ]
+    elif outtype == dlvhex.CONSTANT:
+      Function = clingo.Function
+      return [ tuple([ val.symlit.sym if isinstance(val, ClingoID) else Function(val) for val in _tuple ])
+               for _tuple in tuples ]
+    elif outtype is None:
+      convert = self.outputConverter(holder)
+      return [ convert(_tuple) for _tuple in tuples ]
+    else:
+      raise Exception("unknown output type "+repr(outtype))
+
+  def close(self):
+    # release resources after solving
+    with self.loopsLock:
+      for loop in self.allLoops:
+        loop.close()
+      self.allLoops = []
+
+  def runAsync(self, coroutine):
+    '''
+    run coroutine to completion on the event loop of this thread and return its result
+    '''
+    loop = getattr(self.loops, 'loop', None)
+    if loop is None:
+      loop = asyncio.new_event_loop()
+      self.loops.loop = loop
+      with self.loopsLock:
+        self.allLoops.append(loop)
+    return loop.run_until_complete(coroutine)
+
   def evaluate(self, holder, inputtuple, predicateinputatoms):
     '''
     Convert input tuple (from clingo to dlvhex) and call external atom semantics function.
@@ -251,54 +404,129 @@ class EAtomEvaluator(dlvhex.Backend):
 
     * converts input tuple for execution
     * prepares dlvhex.py for execution
-    * executes
+    * executes (asynchronous external atoms run on the event loop of this thread)
     * converts output tuples
     * cleans up
-    * return result (known true tuples, unknown tuples)
+    * return result (known true tuples, unknown tuples, symbols of inputs read by the external atom)
+      (the latter is None if we do not track this)
     '''
     with self.stats.context('eatom'+holder.name):
-      # prepare input tuple
-      input_arguments = []
-      if __debug__ and len(inputtuple) < len(holder.inspec):
-        # this should be detected already in rewriting in transformEAtomInStatement()
-        raise Exception("external atom {} got fewer inputs ({}) in input tuple ({}) than declared in interface ({})".format(
-          holder.name, len(inputtuple), inputtuple, dlvhex.humanReadableSpec(holder.inspec)))
-      for spec_idx, inp in enumerate(holder.inspec):
-        if inp in [dlvhex.PREDICATE, dlvhex.CONSTANT]:
-          arg = self.clingo2hex(inputtuple[spec_idx])
-          input_arguments.append(arg)
-        elif inp == dlvhex.TUPLE:
-          if (spec_idx + 1) != len(holder.inspec):
-            raise Exception("got TUPLE type which is not in final argument position")
-          # give all remaining arguments as one tuple
-          args = [ self.clingo2hex(x) for x in inputtuple[spec_idx:] ]
-          input_arguments.append(tuple(args))
-        else:
-          raise Exception("unknown input type "+repr(inp))
+      input_arguments = self.inputArguments(holder, inputtuple)
+      inWorker = self.runsInWorker(holder)
+      if holder.isasync and not inWorker:
+        return self.runAsync(self.callAsync(holder, input_arguments, predicateinputatoms))
 
       # call external atom in plugin
-      dlvhex.startExternalAtomCall(input_arguments, predicateinputatoms, self, holder)
-      outKnownTrue, outUnknown = set(), set()
+      dlvhex.startExternalAtomCall(input_arguments, predicateinputatoms, self, holder, self.config.track_input_access)
       try:
-        logging.debug('calling plugin eatom with arguments '+repr(input_arguments))
-        holder.func(*input_arguments)
-        
-        # sanity check
-        inconsistent = set.intersection(dlvhex.currentEvaluation().outputKnownTrue, dlvhex.currentEvaluation().outputUnknown)
-        if len(inconsistent) > 0:
-          raise Exception('external atom {} with arguments {} provided the following tuples both as true and unknown: {} partial interpretation is {}'.format(holder.name, repr(input_arguments), repr(inconsistent), repr(predicateinputatoms)))
-
-        # interpret output that is known to be true
-        outKnownTrue = [ tuple([ self.hex2clingo(val) for val in _tuple ])
-                         for _tuple in dlvhex.currentEvaluation().outputKnownTrue ]
-
-        # interpret output that is unknown whether it is false or true (in partial evaluation)
-        outUnknown = [ tuple([ self.hex2clingo(val) for val in _tuple ])
-                       for _tuple in dlvhex.currentEvaluation().outputUnknown ]
+        if inWorker:
+          self.workers.evaluate(self, holder, inputtuple, predicateinputatoms)
+        else:
+          logging.debug('calling plugin eatom with arguments '+repr(input_arguments))
+          holder.func(*input_arguments)
+        return self.outputOfEvaluation(holder, input_arguments, predicateinputatoms)
       finally:
         dlvhex.cleanupExternalAtomCall()
-      return outKnownTrue, outUnknown
+
+  async def evaluateAsync(self, holder, inputtuple, predicateinputatoms):
+    '''
+    like evaluate, but the awaits of asynchronous external atoms can overlap with other evaluations
+    (must run in a separate asyncio task for each evaluation)
+    '''
+    if not holder.isasync or self.runsInWorker(holder):
+      return self.evaluate(holder, inputtuple, predicateinputatoms)
+    # no stats.context: it cannot measure interleaved evaluations
+    self.stats.count('eatom'+holder.name)
+    input_arguments = self.inputArguments(holder, inputtuple)
+    return await self.callAsync(holder, input_arguments, predicateinputatoms)
+
+  async def callAsync(self, holder, input_arguments, predicateinputatoms):
+    # call asynchronous external atom in plugin
+    dlvhex.startExternalAtomCall(input_arguments, predicateinputatoms, self, holder, self.config.track_input_access)
+    try:
+      logging.debug('calling asynchronous plugin eatom with arguments '+repr(input_arguments))
+      await holder.func(*input_arguments)
+      return self.outputOfEvaluation(holder, input_arguments, predicateinputatoms)
+    finally:
+      dlvhex.cleanupExternalAtomCall()
+
+  def cachedResult(self, holder, inputtuple, predicateinputatoms):
+    # result of an earlier evaluation on the current assignment or None (there is no cache here)
+    return None
+
+  def invalidate(self, eatomnames):
+    # forget results of earlier evaluations of these external atoms (there is no cache here)
+    pass
+
+  def runsInWorker(self, holder):
+    # whether the external atom is evaluated in a worker process
+    return self.workers is not None and self.workers.handles(holder)
+
+  def inputArguments(self, holder, inputtuple):
+    '''
+    convert input tuple (from clingo to dlvhex) into arguments of the external atom function
+    '''
+    input_arguments = []
+    if __debug__ and len(inputtuple) < len(holder.inspec):
+      # this should be detected already in rewriting in transformEAtomInStatement()
+      raise Exception("external atom {} got fewer inputs ({}) in input tuple ({}) than declared in interface ({})".format(
+        holder.name, len(inputtuple), inputtuple, dlvhex.humanReadableSpec(holder.inspec)))
+    for spec_idx, inp in enumerate(holder.inspec):
+      if inp in [dlvhex.PREDICATE, dlvhex.CONSTANT]:
+        arg = self.clingo2hex(inputtuple[spec_idx])
+        input_arguments.append(arg)
+      elif inp == dlvhex.TUPLE:
+        if (spec_idx + 1) != len(holder.inspec):
+          raise Exception("got TUPLE type which is not in final argument position")
+        # give all remaining arguments as one tuple
+        args = [ self.clingo2hex(x) for x in inputtuple[spec_idx:] ]
+        input_arguments.append(tuple(args))
+      else:
+        raise Exception("unknown input type "+repr(inp))
+    return input_arguments
+
+  def outputOfEvaluation(self, holder, input_arguments, predicateinputatoms):
+    '''
+    convert output of the current external atom call (from dlvhex to clingo)
+    '''
+    evaluation = dlvhex.currentEvaluation()
+
+    # sanity check
+    inconsistent = set.intersection(evaluation.outputKnownTrue, evaluation.outputUnknown)
+    if len(inconsistent) > 0:
+      raise Exception('external atom {} with arguments {} provided the following tuples both as true and unknown: {} partial interpretation is {}'.format(holder.name, repr(input_arguments), repr(inconsistent), repr(predicateinputatoms)))
+
+    # interpret output that is known to be true
+    convert = self.outputConverter(holder)
+    outKnownTrue = [ convert(_tuple) for _tuple in evaluation.outputKnownTrue ]
+    if len(evaluation.outputBulk) > 0:
+      outKnownTrue = set(outKnownTrue)
+      for outtype, tuples in evaluation.outputBulk:
+        outKnownTrue.update(self.hex2clingoBulk(holder, outtype, tuples))
+
+    # interpret output that is unknown whether it is false or true (in partial evaluation)
+    outUnknown = [ convert(_tuple) for _tuple in evaluation.outputUnknown ]
+
+    if len(evaluation.outputBulk) > 0:
+      # sanity check (bulk output can only be checked after conversion)
+      inconsistent = outKnownTrue.intersection(outUnknown)
+      if len(inconsistent) > 0:
+        raise Exception('external atom {} with arguments {} provided the following tuples both as true (bulk) and unknown: {}'.format(holder.name, repr(input_arguments), repr(inconsistent)))
+      outKnownTrue = list(outKnownTrue)
+
+    accessed = None
+    if evaluation.accessed is not None:
+      accessed = frozenset(evaluation.accessed)
+    return outKnownTrue, outUnknown, accessed
   
+  # implementation of Backend method
+  def interpretation(self):
+    veri = self.ccontext.verification
+    if veri is None:
+      # not called from a verification (e.g., in grounding)
+      return dlvhex.Backend.interpretation(self)
+    return ClingoInterpretation(self.ccontext.propcontrol.assignment, veri)
+
   # implementation of Backend method
   def storeAtom(self, tpl):
     '''
@@ -313,6 +541,13 @@ class EAtomEvaluator(dlvhex.Backend):
     match_name = tpl[0].symlit.sym.name
     match_arguments = [t.symlit.sym for t in tpl[1:]]
     #print("match_name = {} match_arguments = {}".format(repr(match_name), repr(match_arguments)))
+    veri = self.ccontext.verification
+    if veri is not None:
+      # indexed lookup in the predicate input of the verification that is currently evaluated
+      x = veri.inputs.idOf(clingo.Function(match_name, match_arguments))
+      if x is not None:
+        return x
+      raise dlvhex.StoreAtomException("storeAtom() called with tuple {} that cannot be stored because it is not part of the predicate input or not existing in the ground rewriting (we have no liberal safety)".format(repr(tpl)))
     for x in dlvhex.currentEvaluation().input:
       #logging.info("storeAtom comparing {} with {}: xsxn {} xssa {}".format(repr(tpl), repr(x), repr(x.symlit.sym.name), repr(x.symlit.sym.arguments)))
       if x.symlit.sym.name == match_name and x.symlit.sym.arguments == match_arguments:
@@ -335,17 +570,16 @@ class EAtomEvaluator(dlvhex.Backend):
 
     eatomname = dlvhex.currentEvaluation().holder.name
     inputtuple = dlvhex.currentEvaluation().inputTuple
-    match_args = [t.symlit.sym for t in itertools.chain(inputtuple, args)]
+    match_args = tuple([t.symlit.sym for t in itertools.chain(inputtuple, args)])
+    if self.ccontext.propagator is None:
+      # in grounding there are no replacement atoms (the external atom is not guessed)
+      # -> placeholder without solver literal, nogoods with it are ignored (see learn())
+      return ClingoID(self.ccontext, SymLit(clingo.Function(aux.predEAtomTruth(len(match_args), eatomname), match_args), 0))
     #print("looking up {}".format(repr(match_args)))
-    # find those verification objects that contain the tuple to be stored
-    # XXX maybe first use self.ccontext.propagator.currentVerification as a possible shortcut
-    # (works if the external atom creates nogood for the output tuple of the verification where it was called)
-    for x in self.ccontext.propagator.eatomVerifications[eatomname]:
-      #logging.info("storeOutputAtom {} comparing {} with {}".format(sign, repr(args), repr(x.replacement.sym.arguments)))
-      if x.replacement.sym.arguments == match_args:
-        #logging.info("storeOutputAtom found replacement {}".format(x.replacement))
-        return ClingoID(self.ccontext, x.replacement)
-    #  if x.symlit.sym.name == match_name and x.symlit.sym.arguments == match_arguments:
+    # find the replacement atom with the tuple to be stored
+    x = self.ccontext.propagator.replacementIDs.get((eatomname, match_args), None)
+    if x is not None:
+      return x
     raise dlvhex.StoreAtomException("did not find literal to return in storeOutputAtom for &{}[{}]({})".format(eatomname, inputtuple, repr(args)))
 
   def getInstantiatedOutputAtoms(self):
@@ -353,29 +587,31 @@ class EAtomEvaluator(dlvhex.Backend):
     as storeOutputAtom, but returns all output atoms that have been instantiated for the currently called external atom
     '''
     eatomname = dlvhex.currentEvaluation().holder.name
-    return [  ClingoID(self.ccontext, x.replacement)
-              for x in self.ccontext.propagator.eatomVerifications[eatomname] ]
+    if self.ccontext.propagator is None:
+      # in grounding
+      return ()
+    return self.ccontext.propagator.replacementIDsByEAtom.get(eatomname, ())
 
   def storeConstant(self, s: str):
     if len(s) == 0 or (s[0] == '"' and s[1] == '"'):
       # TODO this is only for backwards compatibility, should be removed in V2
       logging.warning("storeConstant() was used on string '%s', use storeString in the future", s)
       if len(s) == 0:
-        return ClingoID(self.ccontext, SymLit(clingo.String(''), None))
+        return self.ccontext.termID(clingo.String(''))
       else:
-        return ClingoID(self.ccontext, SymLit(clingo.String(s), None))
-    return ClingoID(self.ccontext, SymLit(clingo.Function(s), None))
+        return self.ccontext.termID(clingo.String(s))
+    return self.ccontext.termID(clingo.Function(s))
 
   def storeString(self, s: str):
     if len(s) > 0 and s[0] == '"' and s[1] == '"':
       s = s[1:-1]
-    return ClingoID(self.ccontext, SymLit(clingo.String(s), None))
+    return self.ccontext.termID(clingo.String(s))
 
   def storeInteger(self, i: int):
-    return ClingoID(self.ccontext, SymLit(clingo.Number(i), None))
+    return self.ccontext.termID(clingo.Number(i))
 
   def storeParseable(self, p: str):
-    return ClingoID(self.ccontext, SymLit(clingo.parse_term(p), None))
+    return self.ccontext.termID(clingo.parse_term(p))
 
   # implementation of Backend method
   def learn(self, ng):
@@ -392,8 +628,13 @@ class EAtomEvaluator(dlvhex.Backend):
       logging.info("learning eatom-specified nogood %s", ng)
       assert(all([isinstance(clingoid, ClingoID) for clingoid in ng]))
 
+      propagator = self.ccontext.propagator
+      if propagator is None:
+        # external atoms evaluated in grounding are not guessed, so nogoods are not needed
+        logging.debug("ignored nogood %s learned in grounding", ng)
+        return
       # convert and validate
-      nogood = self.ccontext.propagator.Nogood()
+      nogood = propagator.Nogood()
       replacementAtomSymLit = None
       replacementAtomPositiveSym = None
       for clingoid in ng:
@@ -401,7 +642,7 @@ class EAtomEvaluator(dlvhex.Backend):
           positive = clingoid
         else:
           positive = clingoid.negate()
-        if positive.symlit.sym in self.replacementAtoms:
+        if positive.symlit.sym in propagator.verificationsByReplacement:
           replacementAtomSymLit = clingoid.symlit
           replacementAtomPositiveSymLit = positive.symlit
         if not nogood.add(clingoid.symlit.lit):
@@ -418,7 +659,7 @@ class EAtomEvaluator(dlvhex.Backend):
       # analyze the nogood and check if it exists in learned nogoods
       # if yes, just return and do not learn it
       # if no, add it and schedule to add it in the solver
-      veri = self.eatomVerificationsByReplacement[replacementAtomPositiveSymLit.sym]
+      veri = propagator.verificationsByReplacement[replacementAtomPositiveSymLit.sym]
 
       # extend nogood with relevance atom
       # (only if external atom is relevant, the nogood can make the replacement true/false)
@@ -428,7 +669,7 @@ class EAtomEvaluator(dlvhex.Backend):
         return
       logging.info("learn() added relevance atom %s to nogood which became %s", veri.relevance, nogood)
 
-      # find out of this external atom is positive/negative in the nogood (see __init__ / self.nogoods)
+      # find out of this external atom is positive/negative in the nogood (see ClingoPropagator.ThreadState)
       if replacementAtomSymLit == replacementAtomPositiveSymLit:
         # positive -> indicates that the external atom must be false if all other literals match
         idx = 0
@@ -438,50 +679,197 @@ class EAtomEvaluator(dlvhex.Backend):
 
       # remove replacement literal (it is encoded in the index)
       inogood = frozenset([ x for x in nogood.literals if x != replacementAtomSymLit.lit ])
-      # find out if this nogood is already known
-      if inogood in veri.nogoods[idx]:
+      # find out if this nogood is already known (in this solver thread)
+      nogoods = propagator.currentThreadState().learnedNogoods(veri)
+      if inogood in nogoods[idx]:
         logging.info("learn() skips adding known nogood")
         return
 
       # add to known nogoods
-      veri.nogoods[idx].add(inogood)
+      nogoods[idx].add(inogood)
       logging.debug("learn() records [%d] nogood part %s - nogood is %s+[%s]", idx, inogood, ng, veri.relevance)
 
       # record as nogood to be added
-      self.ccontext.propagator.recordNogood(nogood, defer=True)
+      propagator.recordNogood(nogood, defer=True)
+
+class ClingoInterpretation(dlvhex.Interpretation):
+  '''
+  dlvhex.Interpretation for the predicate inputs of an EAtomVerification
+  values of each predicate are read from the assignment once (when first used)
+  '''
+  def __init__(self, assignment, veri):
+    self.assignment = assignment
+    self.predinputs = veri.predinputsByName
+    # key = predicate name, value = (true, false, unknown)
+    self.values = {}
+
+  def _values(self, pred):
+    name = pred if isinstance(pred, str) else pred.value()
+    if name not in self.values:
+      predinput = self.predinputs.get(name, None)
+      if predinput is None:
+        self.values[name] = (frozenset(), frozenset(), frozenset())
+      else:
+        self.values[name] = predinput.values(self.assignment)
+        # the external atom read all atoms of this predicate
+        accessed = dlvhex.currentEvaluation().accessed
+        if accessed is not None:
+          accessed.update(predinput.symbols)
+    return self.values[name]
 
 class CachedEAtomEvaluator(EAtomEvaluator):
-  counter = 0
-
-  def __init__(self, config, claspcontext, stats):
-    EAtomEvaluator.__init__(self, config, claspcontext, stats)
-    # cache = defaultdict:
-    # key = eatom name
-    # value = defaultdict
-    #   key = inputtuple
-    #   value = dict:
-    #     key = (predicateinputatoms-true, predicateinputatoms-false)
-    #           [because in partial interpretations there are also unknown atoms]
-    #     value = output
-    self.cache = collections.defaultdict(lambda: collections.defaultdict(dict))
+  # value code of a predicate input in the cache key (index = True/False/None from assignment.value)
+  VALUECODE = { True: 1, False: 2, None: 0 }
+
+  def __init__(self, config, claspcontext, stats, workers=None):
+    EAtomEvaluator.__init__(self, config, claspcontext, stats, workers)
+    # cache = OrderedDict (in LRU order, least recently used first):
+    # key = (eatom name, inputtuple, layout identifier, bytes with value code of each predicate input)
+    #       [value codes distinguish true, false, and unknown, because in partial interpretations there are also unknown atoms]
+    # value = (output, estimated size in bytes)
+    self.cache = collections.OrderedDict()
+    self.cacheBytes = 0
+    self.maxEntries = config.eatom_cache_max_entries
+    self.maxBytes = config.eatom_cache_max_bytes
+    # key = tuple of symbols of predicate inputs, value = layout identifier
+    # (symbols are the same in all clingo controls, so the cache can be shared between controls,
+    #  predicate inputs are rebuilt in each propagator init, their layout identifiers are reused)
+    self.layoutIdents = {}
+    # index = layout identifier, value = tuple of symbols of predicate inputs
+    self.layoutSymbols = []
+    # the cache is shared between solver threads
+    self.cacheLock = threading.Lock()
+    # optional cache across runs (only for external atoms that declare themselves deterministic)
+    self.persistent = None
+    if config.persistent_eatom_cache is not None:
+      self.persistent = persistentcache.PersistentEAtomCache(config.persistent_eatom_cache)
+
+  def close(self):
+    EAtomEvaluator.close(self)
+    if self.persistent is not None:
+      self.persistent.close()
+      self.persistent = None
+
+  def invalidate(self, eatomnames):
+    # forget cached results of these external atoms (e.g., because they read an acthex environment that changed)
+    # (the persistent cache is only used for deterministic external atoms)
+    with self.cacheLock:
+      for key in [ key for key in self.cache if key[0] in eatomnames ]:
+        _, size = self.cache.pop(key)
+        self.cacheBytes -= size
+        self.stats.count('cache-invalidate')
 
   def evaluateNoncached(self, holder, inputtuple, predicateinputatoms):
     return EAtomEvaluator.evaluate(self, holder, inputtuple, predicateinputatoms)
 
+  def layoutOf(self, symbols):
+    # must be called with cacheLock
+    ident = self.layoutIdents.get(symbols, None)
+    if ident is None:
+      ident = len(self.layoutSymbols)
+      self.layoutIdents[symbols] = ident
+      self.layoutSymbols.append(symbols)
+    return ident
+
+  def cacheKey(self, holder, inputtuple, predicateinputatoms):
+    if len(predicateinputatoms) == 0:
+      # no predicate inputs (e.g., in grounding)
+      return (holder.name, inputtuple, -1, b'')
+    symbols = tuple([ x.symlit.sym for x in predicateinputatoms ])
+    with self.cacheLock:
+      ident = self.layoutOf(symbols)
+    code = self.VALUECODE
+    if self.ccontext.propcontrol is None:
+      # evaluation in grounding (all predicate inputs are facts, see GringoContext.predicateInputFacts)
+      return (holder.name, inputtuple, ident, bytes([ code[True] ]*len(predicateinputatoms)))
+    # read the assignment directly (this is not an access of the external atom)
+    # (solver literals are not part of the layout, they differ between clingo controls)
+    value = self.ccontext.propcontrol.assignment.value
+    values = bytes([ code[value(x.symlit.lit)] for x in predicateinputatoms ])
+    return (holder.name, inputtuple, ident, values)
+
+  def persistentKey(self, holder, key):
+    _, inputtuple, ident, values = key
+    if ident == -1:
+      symbols = ()
+    else:
+      with self.cacheLock:
+        symbols = self.layoutSymbols[ident]
+    trueinputs = [ sym for sym, v in zip(symbols, values) if v == self.VALUECODE[True] ]
+    falseinputs = [ sym for sym, v in zip(symbols, values) if v == self.VALUECODE[False] ]
+    unknowninputs = [ sym for sym, v in zip(symbols, values) if v == self.VALUECODE[None] ]
+    return persistentcache.PersistentEAtomCache.key(holder, inputtuple, trueinputs, falseinputs, unknowninputs)
+
+  @staticmethod
+  def estimateSize(key, result):
+    # rough estimate of the memory used by one cache entry
+    outKnownTrue, outUnknown, accessed = result
+    size = 200 + len(key[3]) + 8*len(key[1])
+    size += sum([ 64 + 8*len(t) for t in itertools.chain(outKnownTrue, outUnknown) ])
+    if accessed is not None:
+      size += 16*len(accessed)
+    return size
+
+  def evictIfNecessary(self):
+    # must be called with cacheLock
+    while len(self.cache) > 0 and (
+        (self.maxEntries > 0 and len(self.cache) > self.maxEntries) or
+        (self.maxBytes > 0 and self.cacheBytes > self.maxBytes)):
+      _, (_, size) = self.cache.popitem(last=False)
+      self.cacheBytes -= size
+      self.stats.count('cache-evict')
+
+  def cacheLookup(self, holder, key):
+    '''
+    returns (result or None, key in persistent cache or None)
+    '''
+    with self.cacheLock:
+      entry = self.cache.get(key, None)
+      if entry is not None:
+        self.cache.move_to_end(key)
+    if entry is not None:
+      self.stats.count('cache-hit')
+      return entry[0], None
+    self.stats.count('cache-miss')
+    if self.persistent is None or not holder.props.deterministic:
+      return None, None
+    pkey = self.persistentKey(holder, key)
+    result = self.persistent.get(pkey)
+    if result is not None:
+      self.stats.count('persistent-cache-hit')
+      self.cacheStore(key, None, result)
+    return result, pkey
+
+  def cacheStore(self, key, pkey, result):
+    if pkey is not None:
+      self.persistent.put(pkey, result)
+    size = self.estimateSize(key, result)
+    with self.cacheLock:
+      old = self.cache.pop(key, None)
+      if old is not None:
+        self.cacheBytes -= old[1]
+      self.cache[key] = (result, size)
+      self.cacheBytes += size
+      self.evictIfNecessary()
+
+  def cachedResult(self, holder, inputtuple, predicateinputatoms):
+    # (only the in-memory cache, this does not count as a cache miss)
+    key = self.cacheKey(holder, inputtuple, predicateinputatoms)
+    with self.cacheLock:
+      entry = self.cache.get(key, None)
+    if entry is None:
+      return None
+    return entry[0]
+
   def evaluateCached(self, holder, inputtuple, predicateinputatoms):
-    # this is handled by defaultdict
-    storage = self.cache[holder.name][inputtuple]
-    positiveinputatoms = frozenset(x for x in predicateinputatoms if x.isTrue())
-    negativeinputatoms = frozenset(x for x in predicateinputatoms if x.isFalse())
-    key = (positiveinputatoms, negativeinputatoms)
-    if key not in storage:
-      storage[key] = EAtomEvaluator.evaluate(
+    key = self.cacheKey(holder, inputtuple, predicateinputatoms)
+    result, pkey = self.cacheLookup(holder, key)
+    if result is None:
+      # evaluate without holding the lock (other threads can evaluate in the meantime)
+      result = EAtomEvaluator.evaluate(
         self, holder, inputtuple, predicateinputatoms)
-    if __debug__:
-      self.counter += 1
-      if self.counter % 1000 == 1000:
-        logging.info("cache was hit %d times", self.counter)
-    return storage[key]
+      self.cacheStore(key, pkey, result)
+    return result
 
   def evaluate(self, holder, inputtuple, predicateinputatoms):
     # we cache for total and partial evaluations,
@@ -490,16 +878,32 @@ class CachedEAtomEvaluator(EAtomEvaluator):
     # -> the cache avoids recomputations in this case
     return self.evaluateCached(holder, inputtuple, predicateinputatoms)
 
+  async def evaluateAsync(self, holder, inputtuple, predicateinputatoms):
+    # the key must be computed before awaiting (the assignment does not change during check)
+    key = self.cacheKey(holder, inputtuple, predicateinputatoms)
+    result, pkey = self.cacheLookup(holder, key)
+    if result is None:
+      result = await EAtomEvaluator.evaluateAsync(
+        self, holder, inputtuple, predicateinputatoms)
+      self.cacheStore(key, pkey, result)
+    return result
+
 class GringoContext:
   class ExternalAtomCall:
-    def __init__(self, eaeval, holder):
-      self.eaeval = eaeval
+    def __init__(self, context, holder):
+      self.context = context
+      self.eaeval = context.eaeval
       self.holder = holder
       self.ERR = "GringoContext.ExternalAtomCall returning at least one non-Symbol: repr=%s"
     def __call__(self, *arguments):
       logging.debug('GC.EAC(%s) called with %s',self.holder.name, repr(arguments))
-      outKnownTrue, outUnknown = self.eaeval.evaluate(self.holder, arguments, [])
+      # predicate inputs are determined in grounding (see rewriter.GroundingStrata)
+      # (like in the propagator, the evaluation can use the cache and worker processes)
+      predicateinputatoms = self.context.predicateInputFacts(self.holder, arguments)
+      outKnownTrue, outUnknown, _ = self.eaeval.evaluate(self.holder, arguments, predicateinputatoms)
       assert(len(outUnknown) == 0) # no partial evaluation for eatoms in grounding
+      return self.gringoOutput(outKnownTrue)
+    def gringoOutput(self, outKnownTrue):
       outarity = self.holder.outnum
       gringoOut = None
       # interpret special cases for gringo @eatom rewritings:
@@ -528,12 +932,36 @@ class GringoContext:
       # in other cases we can directly use what externalAtomCallHelper returned
       logging.debug('GC.EAC(%s) call returned output %s', self.holder.name, repr(gringoOut))
       return gringoOut
-  def __init__(self, eaeval):
+  def __init__(self, eaeval, control=None):
     assert(isinstance(eaeval, EAtomEvaluator))
     self.eaeval = eaeval
+    # clingo.Control with facts from program parts that were grounded before
+    self.control = control
+    # key = tuple of predicates, value = list of ClingoFactID
+    self.factInputs = {}
   def __getattr__(self, attr):
     #logging.debug('GC.%s called',attr)
-    return self.ExternalAtomCall(self.eaeval, dlvhex.eatoms[attr])
+    return self.ExternalAtomCall(self, dlvhex.eatoms[attr])
+  def predicateInputFacts(self, holder, arguments):
+    '''
+    returns the atoms of predicate inputs in arguments
+    (all of them must be facts, this is ensured by grounding their rules in earlier program parts)
+    '''
+    preds = tuple([ arguments[idx].name for idx, spec in enumerate(holder.inspec) if spec == dlvhex.PREDICATE ])
+    if len(preds) == 0:
+      return []
+    if preds not in self.factInputs:
+      ccontext = self.eaeval.ccontext
+      atoms = []
+      for name, arity, positive in self.control.symbolic_atoms.signatures:
+        if name in preds and positive:
+          for x in self.control.symbolic_atoms.by_signature(name, arity):
+            if not x.is_fact:
+              raise Exception("predicate input {} of external atom {} is not a fact in grounding (please report this and use --nogroundevaluation)".format(
+                x.symbol, holder.name))
+            atoms.append(ClingoFactID(ccontext, SymLit(x.symbol, None)))
+      self.factInputs[preds] = atoms
+    return self.factInputs[preds]
 
 
 class ClingoPropagator:
@@ -546,24 +974,264 @@ class ClingoPropagator:
     * the full list of atoms relevant as predicate inputs (required to evaluate the external atom semantic function)
     * whether we should verify this on partial assignments (or only on total ones)
     """
-    def __init__(self, relevance, replacement, verify_on_partial=False):
+    def __init__(self, eatomname, relevance, replacement, verify_on_partial=False):
+      # name of the external atom
+      self.eatomname = eatomname
+      # index in ClingoPropagator.verifications
+      self.index = None
       # symlit for ground eatom relevance
       self.relevance = relevance
       # symlit for ground eatom replacement
       self.replacement = replacement
-      # key = argument position, value = list of ClingoID
-      self.predinputs = collections.defaultdict(list)
-      # list of all elements in self.predinputs (cache)
-      self.allinputs = []
+      # in replacement atom everything that is not output is relevant input
+      replargs = replacement.sym.arguments
+      outnum = dlvhex.eatoms[eatomname].outnum
+      self.inputtuple = tuple(replargs[0:len(replargs)-outnum])
+      self.outputtuple = tuple(replargs[len(replargs)-outnum:len(replargs)])
+      # verifications with the same group key are verified with a single external atom evaluation
+      self.groupkey = (eatomname, self.inputtuple)
+      # key = argument position, value = PredicateInput (shared with other verifications)
+      self.predinputs = {}
+      # key = predicate name, value = PredicateInput (same as in self.predinputs)
+      self.predinputsByName = {}
+      # PredicateInput with atoms of all predicate inputs (shared with other verifications)
+      self.inputs = ClingoPropagator.PredicateInput(())
+      # tuple of ClingoID of all elements in self.predinputs
+      self.allinputs = self.inputs.ids
+      # solver literals of predicate inputs where the external atom is monotonic/antimonotonic
+      # (shared with other verifications)
+      self.monotonic = frozenset()
+      self.antimonotonic = frozenset()
       # whether this should be verified on partial assignments
       self.verify_on_partial = verify_on_partial
-      # nogoods that are relevant for this verification:
-      # (nogoods for falsity, nogoods for truth)
+      # index in ClingoPropagator.cacheInputs (only used with cache propagation)
+      self.cacheInputsIndex = None
+      # literals whose changes are given to propagate() for this verification (or fixed in init)
+      # (only used with incremental propagation, None otherwise)
+      self.watchedLiterals = None
+
+  class ThreadState:
+    """
+    state of the propagator that is specific to one clasp solver thread
+    """
+    def __init__(self, dirtyVerifications, assignedInputs):
+      # indices of verifications that need to be checked again because one of their literals changed
+      # (only used with incremental propagation)
+      self.dirtyVerifications = dirtyVerifications
+      # index = index in ClingoPropagator.cacheInputs, value = number of assigned literals of these inputs
+      # (only used with cache propagation)
+      self.assignedInputs = assignedInputs
+      # list of (nogood, lock) to add
+      self.nogoodsToAdd = []
+      # key = EAtomVerification.index
+      # value = nogoods that are relevant for this verification and have been added in this thread:
+      # (NogoodDatabase for falsity, NogoodDatabase for truth)
       # nogoods for falsity contain positive replacement literal
       # nogoods for truth contain negative replacement literal
       # these nogoods are stored _without_ the replacement literal
       # (it is implicit from the set in which the nogood is stored)
-      self.nogoods = (set(), set())
+      self.nogoods = {}
+      # key = EAtomVerification.index
+      # value = input/output nogoods for external atoms with (anti)monotonic inputs (see decidingNogoods)
+      self.ionogoods = {}
+      # key = EAtomVerification.groupkey
+      # value = PartialSchedule (only for external atoms with restricted partial evaluation)
+      self.partialSchedules = {}
+
+    def decidingNogoods(self, veri):
+      '''
+      input/output nogoods of external atoms with (anti)monotonic inputs that decide the truth of veri
+      (false, true) like learnedNogoods, but these nogoods can be deleted by the solver
+      '''
+      if veri.index not in self.ionogoods:
+        self.ionogoods[veri.index] = (
+          ClingoPropagator.NogoodDatabase(veri.relevance.lit, veri.watchedLiterals),
+          ClingoPropagator.NogoodDatabase(veri.relevance.lit, veri.watchedLiterals))
+      return self.ionogoods[veri.index]
+
+    def learnedNogoods(self, veri):
+      if veri.index not in self.nogoods:
+        # all these nogoods contain the relevance literal
+        self.nogoods[veri.index] = (
+          ClingoPropagator.NogoodDatabase(veri.relevance.lit, veri.watchedLiterals),
+          ClingoPropagator.NogoodDatabase(veri.relevance.lit, veri.watchedLiterals))
+      return self.nogoods[veri.index]
+
+    def assigned(self, index, lit):
+      # lit became true and is watched for the verification with this index (see NogoodDatabase.assigned)
+      for ngdbs in (self.nogoods.get(index, None), self.ionogoods.get(index, None)):
+        if ngdbs is not None:
+          ngdbs[0].assigned(lit)
+          ngdbs[1].assigned(lit)
+
+  class PartialSchedule:
+    """
+    state of the scheduling of partial evaluations of one group of verifications in one solver thread
+    """
+    def __init__(self):
+      # number of assigned predicate inputs at the last partial evaluation
+      self.assigned = 0
+      # number of partial evaluations that are still skipped, and current length of the back-off
+      self.skip = 0
+      self.backoff = 0
+
+  class NogoodDatabase:
+    """
+    set of nogoods (frozensets of solver literals)
+    each nogood is indexed by one of its literals (its watch)
+    so that lookups only inspect nogoods where the watch is relevant
+
+    if the literals that become true are given to assigned() (see ClingoPropagator.propagate)
+    nogoods are also indexed by all their literals, and firing() inspects only nogoods
+    that can have become firing since the last lookup that found no firing nogood
+    """
+    def __init__(self, common=None, tracked=None):
+      # literal that is contained in (almost) all nogoods, it is not a useful watch
+      self.common = common
+      # literals that are given to assigned() when they become true (None = no literals)
+      self.tracked = tracked
+      # all nogoods
+      self.nogoods = set()
+      # key = watch literal (None for the empty nogood), value = list of nogoods
+      self.byWatch = {}
+      # key = literal, value = list of nogoods that contain it (only nogoods with tracked literals)
+      self.byLiteral = {}
+      # nogoods with literals that are not tracked (inspected in each lookup)
+      self.untracked = []
+      # literals that became true since the last lookup that found no firing nogood
+      # (None = there was no such lookup, all nogoods must be inspected)
+      self.changed = None
+      # nogoods with tracked literals added since the last lookup that found no firing nogood
+      self.added = []
+
+    def __len__(self):
+      return len(self.nogoods)
+
+    def __contains__(self, nogood):
+      return nogood in self.nogoods
+
+    def __iter__(self):
+      return iter(self.nogoods)
+
+    def add(self, nogood):
+      if nogood in self.nogoods:
+        return
+      self.nogoods.add(nogood)
+      candidates = [ lit for lit in nogood if lit != self.common ]
+      if len(candidates) == 0:
+        candidates = list(nogood)
+      if len(candidates) == 0:
+        watch = None
+      else:
+        # balance the index: use the literal that watches the fewest nogoods so far
+        watch = min(candidates, key=lambda lit: len(self.byWatch.get(lit, ())))
+      self.byWatch.setdefault(watch, []).append(nogood)
+      if self.tracked is None:
+        return
+      if not nogood.issubset(self.tracked):
+        self.untracked.append(nogood)
+        return
+      for lit in nogood:
+        self.byLiteral.setdefault(lit, []).append(nogood)
+      if self.changed is not None:
+        self.added.append(nogood)
+
+    def assigned(self, lit):
+      '''
+      record that lit (a tracked literal) became true
+      '''
+      if self.changed is not None:
+        self.changed.add(lit)
+
+    def firing(self, assignment):
+      '''
+      returns a nogood where all literals are true in assignment or None
+      '''
+      is_true = assignment.is_true
+      if self.changed is None:
+        # all nogoods (via their watch)
+        candidates = itertools.chain.from_iterable(
+          nogoods for watch, nogoods in self.byWatch.items() if watch is None or is_true(watch))
+      else:
+        # a nogood that became firing contains a literal that became true since the last lookup
+        candidates = itertools.chain(self.untracked, self.added, itertools.chain.from_iterable(
+          self.byLiteral.get(lit, ()) for lit in self.changed if is_true(lit)))
+      for nogood in candidates:
+        if all([ is_true(lit) for lit in nogood ]):
+          return nogood
+      if self.tracked is not None:
+        self.changed = set()
+        self.added = []
+      return None
+
+    def subsuming(self, literals):
+      '''
+      returns a nogood that is a subset of literals (a set of solver literals) or None
+      '''
+      # a subset of literals must be watched by one of literals
+      for watch in itertools.chain(literals, [None]):
+        for nogood in self.byWatch.get(watch, ()):
+          if nogood.issubset(literals):
+            return nogood
+      return None
+
+  class PredicateInput:
+    """
+    atoms of one or more predicates used as predicate input to external atoms
+    (built once in init and shared by all verifications that use the same predicates)
+    """
+    def __init__(self, ids):
+      # tuple of ClingoID
+      self.ids = tuple(ids)
+      # solver literals of self.ids (same order)
+      self.literals = array.array('i', [ x.symlit.lit for x in self.ids ])
+      # key = symbol, value = solver literal (created on demand)
+      self.literalBySymbol = None
+      # key = symbol, value = ClingoID (created on demand)
+      self.idBySymbol = None
+      # tuples of ClingoIDs of arguments of self.ids (same order, created on demand)
+      self.argumentTuples = None
+      # symbols of self.ids (created on demand)
+      self.symbols = None
+
+    def values(self, assignment):
+      '''
+      returns frozensets of argument tuples of atoms that are true, false, and unassigned in assignment
+      '''
+      if self.argumentTuples is None:
+        self.argumentTuples = tuple([
+          tuple([ x.ccontext.termID(term) for term in x.symlit.sym.arguments ])
+          for x in self.ids ])
+        self.symbols = tuple([ x.symlit.sym for x in self.ids ])
+      true, false, unknown = [], [], []
+      for lit, args in zip(self.literals, self.argumentTuples):
+        value = assignment.value(lit)
+        if value == True:
+          true.append(args)
+        elif value == False:
+          false.append(args)
+        else:
+          unknown.append(args)
+      return frozenset(true), frozenset(false), frozenset(unknown)
+
+    def idOf(self, symbol):
+      '''
+      returns ClingoID of given symbol or None if it is not in this predicate input
+      '''
+      if self.idBySymbol is None:
+        self.idBySymbol = dict([ (x.symlit.sym, x) for x in self.ids ])
+      return self.idBySymbol.get(symbol, None)
+
+    def literalsOf(self, symbols):
+      '''
+      returns solver literals of given symbols or None if some symbol is not in this predicate input
+      '''
+      if self.literalBySymbol is None:
+        self.literalBySymbol = dict([ (x.symlit.sym, x.symlit.lit) for x in self.ids ])
+      try:
+        return [ self.literalBySymbol[sym] for sym in symbols ]
+      except KeyError:
+        return None
 
   class Nogood:
     def __init__(self):
@@ -588,13 +1256,26 @@ class ClingoPropagator:
   class StopPropagation(Exception):
     pass
 
-  def __init__(self, config, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms):
+  def __init__(self, config, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms, pool=None):
     self.name = 'ClingoProp('+name+'):'
+    # thread pool for concurrent evaluation of thread-safe external atoms (or None)
+    self.pool = pool
     # configuration object
     self.config = config
     # key = eatom
     # value = list of EAtomVerification
     self.eatomVerifications = collections.defaultdict(list)
+    # all EAtomVerification instances (index = EAtomVerification.index)
+    self.verifications = []
+    # key = replacement symbol
+    # value = EAtomVerification
+    self.verificationsByReplacement = {}
+    # key = watched solver literal
+    # value = list of indices of verifications that depend on this literal
+    # (only used with incremental propagation)
+    self.watches = {}
+    # one ThreadState for each clasp solver thread (index = thread_id)
+    self.threadStates = []
     # mapping from solver literals to lists of strings
     self.dbgSolv2Syms = collections.defaultdict(list)
     # mapping from symbol to solver literal
@@ -607,16 +1288,41 @@ class ClingoPropagator:
     self.eaeval = eaeval
     # list of names of external atoms that should do checks on partial assignments
     self.partial_evaluation_eatoms = partial_evaluation_eatoms
-    # list of nogoods to add
-    self.nogoodsToAdd = []
-    # verification that is currently verified using an external atom call
-    # this is used to handle learned nogoods
-    self.currentVerification = None
 
   def init(self, init):
     name = self.name+'init:'
+    # init is called for each solve call (e.g., in the FLP checker), so we start from scratch
+    self.eatomVerifications = collections.defaultdict(list)
+    self.verifications = []
+    self.verificationsByReplacement = {}
+    # key = (eatom name, tuple of replacement atom arguments), value = ClingoID of replacement atom
+    self.replacementIDs = {}
+    # key = eatom name, value = tuple of ClingoID of all replacement atoms
+    self.replacementIDsByEAtom = {}
+    self.watches = {}
+    # solver literals that are watched (for incremental propagation and/or cache propagation)
+    self.watchedLiterals = set()
+    # cache propagation: list of (PredicateInput, list of verifications with these inputs)
+    self.cacheInputs = []
+    # key = id(PredicateInput), value = index in self.cacheInputs
+    self.cacheInputsIndex = {}
+    # key = watched solver literal, value = list of indices in self.cacheInputs (one per occurrence of the literal)
+    self.cacheWatches = {}
+    # key = relevance literal, value = list of verifications
+    self.relevanceWatches = {}
+    # index = index in self.cacheInputs, value = number of literals that are fixed (never change)
+    self.fixedInputs = []
+    # key = predicate name, value = list of arities of that predicate in the ground program
+    self.aritiesByName = collections.defaultdict(list)
+    for aname, aarity, apositive in init.symbolic_atoms.signatures:
+      if aarity not in self.aritiesByName[aname]:
+        self.aritiesByName[aname].append(aarity)
+    # key = tuple of predicate names, value = PredicateInput
+    self.predicateInputs = {}
+    # key = (eatom name, predicate names in input tuple), value = (monotonic literals, antimonotonic literals)
+    self.monotonicities = {}
     # register mapping for solver/grounder atoms!
-    # no need for watches as long as we use only check()
+    # watches are only registered for incremental propagation, otherwise we only use check()
     require_partial_evaluation = False
     for eatomname, signatures in self.pcontext.eatoms.items():
       logging.info("%s eatom %s has signatures %s", name, eatomname, signatures)
@@ -632,32 +1338,44 @@ class ClingoPropagator:
           logging.debug('%s   relevance atom %s', name, xrel.symbol)
           relevance = SymLit(xrel.symbol, init.solver_literal(xrel.literal))
 
-          verification = self.EAtomVerification(relevance, replacement, verify_on_partial)
+          verification = self.EAtomVerification(eatomname, relevance, replacement, verify_on_partial)
 
-          # get symbols given to predicate inputs and register their literals
+          # get symbols given to predicate inputs (and their literals)
+          prednames = []
           for argpos, argtype in enumerate(dlvhex.eatoms[eatomname].inspec):
             if argtype == dlvhex.PREDICATE:
               argval = str(xrep.symbol.arguments[argpos])
               logging.debug('%s   argument %d is %s', name, argpos, argval)
-              relevantSig = [ (aarity, apol) for (aname, aarity, apol) in init.symbolic_atoms.signatures if aname == argval ]
-              logging.debug('%s   relevantSig %s', name, repr(relevantSig))
-              for aarity, apol in relevantSig:
-                for ax in init.symbolic_atoms.by_signature(argval, aarity):
-                  slit = init.solver_literal(ax.literal)
-                  logging.debug('%s       atom %s (neg:%s) / slit %d', name, str(ax.symbol), ax.symbol.negative, slit)
-                  predinputid = ClingoID(self.ccontext, SymLit(ax.symbol, slit))
-                  verification.predinputs[argpos].append(predinputid)
-
-          verification.allinputs = frozenset(hexlite.flatten([idlist for idlist in verification.predinputs.values()]))
+              verification.predinputs[argpos] = self._predicateInput(init, (argval,))
+              verification.predinputsByName[argval] = verification.predinputs[argpos]
+              if argval not in prednames:
+                prednames.append(argval)
+          verification.inputs = self._predicateInput(init, tuple(prednames))
+          verification.allinputs = verification.inputs.ids
+          verification.monotonic, verification.antimonotonic = self._monotonicity(eatomname, verification)
           self.eatomVerifications[eatomname].append(verification)
-          self.eaeval.eatomVerificationsByReplacement[replacement.sym] = verification
-          self.eaeval.replacementAtoms.add(replacement.sym)
+          verification.index = len(self.verifications)
+          self.verifications.append(verification)
+          if self.config.incremental_propagation:
+            self._watchVerification(init, verification)
+          if self.config.cache_propagation:
+            self._watchInputsForCache(init, verification)
+          self.verificationsByReplacement[replacement.sym] = verification
+          self.replacementIDs[(eatomname, tuple(replacement.sym.arguments))] = ClingoID(self.ccontext, replacement)
+      self.replacementIDsByEAtom[eatomname] = tuple([
+        self.replacementIDs[(eatomname, tuple(veri.replacement.sym.arguments))]
+        for veri in self.eatomVerifications[eatomname] ])
       if found_this_eatomname:
         # this eatom is used at least once in the search
         if eatomname in self.partial_evaluation_eatoms:
           logging.info('%s will perform checks on partial assignments due to external atom %s', name, eatomname)
           require_partial_evaluation = True
 
+    # everything needs to be checked at least once (in each thread)
+    self.threadStates = [ self.ThreadState(set(range(len(self.verifications))), list(self.fixedInputs)) for thread in range(init.number_of_threads) ]
+    if self.config.incremental_propagation or self.config.cache_propagation:
+      logging.info('%s watching %d literals for %d verifications', name, len(self.watchedLiterals), len(self.verifications))
+
     if require_partial_evaluation:
       init.check_mode = clingo.PropagatorCheckMode.Fixpoint
     else:
@@ -677,10 +1395,177 @@ class ClingoPropagator:
 
     # WONTFIX (near future) implement this current type of check in on_model where we can comfortably add all nogoods immediately
     # DONE (near future) use partial checks and stay in check()
-    # TODO (far future) create one propagator for each external atom (or even for each external atom literal)
-    #                   which watches predicate inputs, relevance, and replacement, and incrementally finds when it should compute
-    #                   [then we need to find out which grounded input tuple belongs to which atom, so we might need
-    #                    nonground-eatom-literal-unique input tuple auxiliaries (which might hurt efficiency)]
+    # DONE (far future) watch predicate inputs, relevance, and replacement, and incrementally find out what to check
+    #                   (see --incremental-propagation, propagate(), and undo())
+
+  def _predicateInput(self, init, prednames):
+    '''
+    get the PredicateInput for the atoms of the given predicates, create it only once
+    '''
+    if prednames not in self.predicateInputs:
+      if len(prednames) == 1:
+        predname = prednames[0]
+        ids = []
+        for arity in self.aritiesByName.get(predname, []):
+          for ax in init.symbolic_atoms.by_signature(predname, arity):
+            slit = init.solver_literal(ax.literal)
+            logging.debug('%s       atom %s / slit %d', self.name, str(ax.symbol), slit)
+            ids.append(ClingoID(self.ccontext, SymLit(ax.symbol, slit)))
+      else:
+        ids = itertools.chain(*[ self._predicateInput(init, (predname,)).ids for predname in prednames ])
+      self.predicateInputs[prednames] = self.PredicateInput(ids)
+    return self.predicateInputs[prednames]
+
+  def _monotonicity(self, eatomname, veri):
+    '''
+    get solver literals of inputs where the external atom is monotonic and antimonotonic
+    (an input counts only if the property holds for all arguments where its predicate is used)
+    '''
+    props = dlvhex.eatoms[eatomname].props
+    key = (eatomname, tuple([ veri.inputtuple[argpos] for argpos in sorted(veri.predinputs) ]))
+    if key not in self.monotonicities:
+      monotonic, antimonotonic = set(), set()
+      if len(props.monotonicInputs) > 0 or len(props.antimonotonicInputs) > 0:
+        # key = literal, value = list of argument positions that use this literal
+        positions = collections.defaultdict(list)
+        for argpos, predinput in veri.predinputs.items():
+          for lit in predinput.literals:
+            positions[lit].append(argpos)
+        for lit, argposs in positions.items():
+          if all([ argpos in props.monotonicInputs for argpos in argposs ]):
+            monotonic.add(lit)
+          elif all([ argpos in props.antimonotonicInputs for argpos in argposs ]):
+            antimonotonic.add(lit)
+      self.monotonicities[key] = (frozenset(monotonic), frozenset(antimonotonic))
+    return self.monotonicities[key]
+
+  def _watchVerification(self, init, veri):
+    '''
+    watch both polarities of all literals that determine the outcome of verifying veri
+    '''
+    lits = set([veri.relevance.lit, veri.replacement.lit])
+    lits.update(veri.inputs.literals)
+    veri.watchedLiterals = frozenset(lits | set([ -lit for lit in lits ]))
+    for lit in lits:
+      if init.assignment.is_fixed(lit):
+        # will never change
+        continue
+      for wlit in [lit, -lit]:
+        self._addWatch(init, wlit)
+        self.watches.setdefault(wlit, []).append(veri.index)
+
+  def _watchInputsForCache(self, init, veri):
+    '''
+    watch both polarities of the predicate inputs of veri (to count assigned inputs) and its relevance literal
+    '''
+    idx = self.cacheInputsIndex.get(id(veri.inputs), None)
+    if idx is None:
+      idx = len(self.cacheInputs)
+      self.cacheInputsIndex[id(veri.inputs)] = idx
+      self.cacheInputs.append( (veri.inputs, []) )
+      fixed = 0
+      for lit in veri.inputs.literals:
+        if init.assignment.is_fixed(lit):
+          fixed += 1
+          continue
+        for wlit in [lit, -lit]:
+          self._addWatch(init, wlit)
+          self.cacheWatches.setdefault(wlit, []).append(idx)
+      self.fixedInputs.append(fixed)
+    veri.cacheInputsIndex = idx
+    self.cacheInputs[idx][1].append(veri)
+    if not init.assignment.is_fixed(veri.relevance.lit):
+      self._addWatch(init, veri.relevance.lit)
+      self.relevanceWatches.setdefault(veri.relevance.lit, []).append(veri)
+
+  def _addWatch(self, init, lit):
+    if lit not in self.watchedLiterals:
+      init.add_watch(lit)
+      self.watchedLiterals.add(lit)
+
+  def propagate(self, control, changes):
+    '''
+    only called for watched literals (i.e., with incremental or cache propagation)
+    records which verifications need to be checked again
+    and assigns replacement atoms from the cache where all predicate inputs are assigned
+    '''
+    state = self.threadStates[control.thread_id]
+    dirty = state.dirtyVerifications
+    for lit in changes:
+      for idx in self.watches.get(lit, ()):
+        dirty.add(idx)
+        state.assigned(idx, lit)
+    if len(self.cacheInputs) > 0:
+      # verifications where the last input or the relevance literal was assigned
+      candidates = []
+      for lit in changes:
+        for idx in self.cacheWatches.get(lit, ()):
+          state.assignedInputs[idx] += 1
+          if state.assignedInputs[idx] == len(self.cacheInputs[idx][0].literals):
+            candidates.extend(self.cacheInputs[idx][1])
+        candidates.extend(self.relevanceWatches.get(lit, ()))
+      if len(candidates) > 0:
+        with self.ccontext(control, self):
+          try:
+            self.propagateFromCache(control, state, candidates)
+          except ClingoPropagator.StopPropagation:
+            logging.debug(self.name+' aborted propagation from cache')
+
+  def undo(self, thread_id, assignment, changes):
+    '''
+    only called for watched literals (i.e., with incremental or cache propagation)
+    verifications that were settled on the undone assignment need to be checked again
+    '''
+    state = self.threadStates[thread_id]
+    dirty = state.dirtyVerifications
+    for lit in changes:
+      dirty.update(self.watches.get(lit, ()))
+      for idx in self.cacheWatches.get(lit, ()):
+        state.assignedInputs[idx] -= 1
+
+  def propagateFromCache(self, control, state, candidates):
+    '''
+    assign the replacement literal of relevant verifications with all inputs assigned
+    if the cache holds the result of the external atom for this assignment
+    (the input/output nogood that would be learned in check() is the reason)
+    '''
+    assignment = control.assignment
+    # key = groupkey, value = cached result or None
+    results = {}
+    for veri in candidates:
+      if assignment.value(veri.replacement.lit) is not None or not assignment.is_true(veri.relevance.lit):
+        continue
+      inputs = self.cacheInputs[veri.cacheInputsIndex][0]
+      if state.assignedInputs[veri.cacheInputsIndex] != len(inputs.literals):
+        continue
+      if veri.groupkey not in results:
+        result = self.eaeval.cachedResult(dlvhex.eatoms[veri.eatomname], veri.inputtuple, veri.allinputs)
+        if result is not None:
+          result = (frozenset(result[0]), frozenset(result[1]), result[2])
+        results[veri.groupkey] = result
+      result = results[veri.groupkey]
+      if result is None:
+        continue
+      outKnownTrue, outUnknown, accessed = result
+      if veri.outputtuple in outUnknown:
+        continue
+      realValue = veri.outputtuple in outKnownTrue
+      inputnogood = self._inputNogood(control, veri, accessed, realValue)
+      if inputnogood is None:
+        continue
+      nogood = self._inputOutputNogood(control, state, veri, realValue, inputnogood)
+      if nogood is None:
+        continue
+      self.pcontext.stats.count('cache-propagation')
+      # lock=False: the solver can delete the reason, the cache produces it again
+      self.addNogood(list(nogood.literals), lock=False)
+
+  def currentThreadState(self):
+    '''
+    state of the solver thread in the current ccontext
+    '''
+    return self.threadStates[self.ccontext.propcontrol.thread_id]
+
   def check(self, control):
     '''
     * get valueAuxTrue and valueAuxFalse truth values
@@ -710,150 +1595,378 @@ class ClingoPropagator:
       if len(unassigned) > 0: logging.debug(name+" assignment has unassigned slits "+' '.join(unassigned))
       logging.debug(name+"assignment is "+' '.join([ str(x[0]) for x in self.dbgSym2Solv.items() if control.assignment.is_true(x[1]) ]))
     partial_evaluation = not control.assignment.is_total
+    state = self.threadStates[control.thread_id]
     with self.ccontext(control, self):
       try:
         # do this within ccontext and within the try/catch that logs StopPropagation
         self.addPendingNogoodsOrThrow()
-        for eatomname, veriList in self.eatomVerifications.items():
-          for veri in veriList:
-            if partial_evaluation and not veri.verify_on_partial:
-              # just skip this verification here
-              continue
-            if control.assignment.is_true(veri.relevance.lit):
-              logging.info(name+' relevance of {} is true'.format(veri.replacement.sym))
-              if self.config.consider_skipping_evaluation_if_nogood_determines_truth:
-                if self.nogoodConfirmsTruthOfAtom(control, veri):
-                  logging.info(name+' no need to verify atom {} (existing nogood)'.format(veri.replacement.sym))
-                else:
-                  # verify truth because nogood did not determine it
-                  self.verifyTruthOfAtom(eatomname, control, veri)
-                  # add new pending nogoods (this is a potential output of above verification) if required
-                  self.addPendingNogoodsOrThrow()
-              else:
-                # always verify truth
-                self.verifyTruthOfAtom(eatomname, control, veri)
-                # add new pending nogoods (this is a potential output of above verification) if required
-                self.addPendingNogoodsOrThrow()
-            else:
-              logging.debug(name+' no need to verify atom {} (relevance)'.format(veri.replacement.sym))
+        if self.config.incremental_propagation:
+          # only verifications where some literal changed since they were settled
+          logging.debug('%s checking %d of %d verifications', name, len(state.dirtyVerifications), len(self.verifications))
+          candidates = [ self.verifications[idx] for idx in sorted(state.dirtyVerifications) ]
+        else:
+          candidates = self.verifications
+        # key = EAtomVerification.groupkey
+        # value = list of verifications in this group that require an evaluation
+        toEvaluate = {}
+        for veri in candidates:
+          if self.needsEvaluation(control, state, veri, partial_evaluation):
+            toEvaluate.setdefault(veri.groupkey, []).append(veri)
+        groups = list(toEvaluate.values())
+        if partial_evaluation:
+          groups = [ veris for veris in groups if self.partialEvaluationScheduled(control, state, veris) ]
+        futures, cancelled = self.startConcurrentEvaluations(control, groups)
+        try:
+          asyncResults = self.evaluateAsyncGroups(groups)
+          # verify in deterministic order (also if evaluations run concurrently)
+          for gidx, veris in enumerate(groups):
+            result = None
+            if gidx in futures:
+              future, learned = futures[gidx]
+              result = future.result()
+              state.nogoodsToAdd.extend(learned)
+            elif gidx in asyncResults:
+              result, learned = asyncResults[gidx]
+              state.nogoodsToAdd.extend(learned)
+            verified, undecided = self.verifyTruthOfAtoms(control, state, veris, result)
+            if partial_evaluation:
+              self.updatePartialBackoff(state, veris, undecided)
+            state.dirtyVerifications.difference_update([ veri.index for veri in verified ])
+            # add new pending nogoods (this is a potential output of above verification) if required
+            self.addPendingNogoodsOrThrow()
+        finally:
+          self.finishConcurrentEvaluations(futures, cancelled)
       except ClingoPropagator.StopPropagation:
         # this is part of the intended behavior
         logging.debug(name+' aborted propagation')
         #logging.debug('aborted from '+traceback.format_exc())
     logging.info(self.name+' leaving check() propagator')
   
-  def nogoodConfirmsTruthOfAtom(self, control, veri):
+  def needsEvaluation(self, control, state, veri, partial_evaluation):
+    '''
+    find out whether veri must be verified by evaluating its external atom
+    verifications that are settled without evaluation are no longer dirty
+    (they need to be checked again only if one of their literals changes)
+    '''
+    name = self.name+'check:'
+    if partial_evaluation and not veri.verify_on_partial:
+      # just skip this verification here
+      return False
+    if not control.assignment.is_true(veri.relevance.lit):
+      logging.debug(name+' no need to verify atom {} (relevance)'.format(veri.replacement.sym))
+      state.dirtyVerifications.discard(veri.index)
+      return False
+    logging.info(name+' relevance of {} is true'.format(veri.replacement.sym))
+    if self.config.consider_skipping_evaluation_if_nogood_determines_truth:
+      if self.nogoodConfirmsTruthOfAtom(control, state, veri):
+        logging.info(name+' no need to verify atom {} (existing nogood)'.format(veri.replacement.sym))
+        # still dirty: the nogood can contain literals that are not watched for this verification
+        return False
+    # verify truth because nogood did not determine it
+    return True
+
+  def observe(self, veri, realValue):
+    # called with the truth value of the external atom of veri for each evaluation (see HeuristicClingoPropagator)
+    pass
+
+  def partialEvaluationScheduled(self, control, state, veris):
+    '''
+    decide whether a group of verifications is evaluated on the current partial assignment
+    (according to the scheduling declared in the ExtSourceProperties of the external atom)
+    '''
+    props = dlvhex.eatoms[veris[0].eatomname].props
+    if props.partialThreshold is None and props.partialDecisionLevels is None and props.partialBackoff is None:
+      return True
+    schedule = state.partialSchedules.get(veris[0].groupkey, None)
+    if schedule is None:
+      schedule = state.partialSchedules[veris[0].groupkey] = self.PartialSchedule()
+    if props.partialDecisionLevels is not None and control.assignment.decision_level not in props.partialDecisionLevels:
+      self.pcontext.stats.count('partial-skip-levels')
+      return False
+    assigned = None
+    if props.partialThreshold is not None:
+      value = control.assignment.value
+      assigned = sum([ 1 for lit in veris[0].inputs.literals if value(lit) is not None ])
+      # after backtracking, count newly assigned inputs from the current assignment
+      schedule.assigned = min(schedule.assigned, assigned)
+      if assigned - schedule.assigned < props.partialThreshold:
+        self.pcontext.stats.count('partial-skip-threshold')
+        return False
+    if props.partialBackoff is not None and schedule.skip > 0:
+      schedule.skip -= 1
+      self.pcontext.stats.count('partial-skip-backoff')
+      return False
+    if assigned is not None:
+      schedule.assigned = assigned
+    return True
+
+  def updatePartialBackoff(self, state, veris, undecided):
+    # double the back-off if the partial evaluation decided nothing, reset it otherwise
+    props = dlvhex.eatoms[veris[0].eatomname].props
+    if props.partialBackoff is None:
+      return
+    schedule = state.partialSchedules[veris[0].groupkey]
+    if len(undecided) == len(veris):
+      schedule.backoff = min(max(1, 2*schedule.backoff), props.partialBackoff)
+      schedule.skip = schedule.backoff
+    else:
+      schedule.backoff = 0
+      schedule.skip = 0
+
+  def nogoodConfirmsTruthOfAtom(self, control, state, veri):
     logging.debug("checking if %s is confirmed by previously learned nogoods", veri.replacement)
     target = 1 if control.assignment.is_true(veri.replacement.lit) else 0
-    ngset = veri.nogoods[target]
-    logging.debug("  previously recorded atom-specified nogoods for target %d without replacement: %s", target, ngset)
-    for nogood in ngset:
-      check = [ control.assignment.is_true(l) for l in nogood ]
-      logging.debug("  checking nogood %s: check=%s", nogood, check)
-      if all(check):
-          # this nogood fires!
-          logging.debug("previously learned nogood %s decides truth %s of atom!", nogood, target)
-          return True
+    ngdb = state.learnedNogoods(veri)[target]
+    logging.debug("  %d previously recorded atom-specified nogoods for target %d without replacement", len(ngdb), target)
+    nogood = ngdb.firing(control.assignment)
+    if nogood is None and veri.index in state.ionogoods:
+      # input/output nogood of an evaluation on a smaller or larger (anti)monotonic input
+      nogood = state.decidingNogoods(veri)[target].firing(control.assignment)
+    if nogood is not None:
+      logging.debug("previously learned nogood %s decides truth %s of atom!", nogood, target)
+      return True
     return False
 
-  def verifyTruthOfAtom(self, eatomname, control, veri):
+  def evaluateGroup(self, veris, nogoodSink=None):
+    '''
+    evaluate the external atom of a group of verifications (same external atom and input tuple)
+    returns (outKnownTrue, outUnknown, accessed) as EAtomEvaluator.evaluate
+    '''
+    first = veris[0]
+    eatomname, inputtuple = first.groupkey
+    with self.ccontext.evaluating(first, nogoodSink):
+      return self.eaeval.evaluate(dlvhex.eatoms[eatomname], inputtuple, first.allinputs)
+
+  async def evaluateGroupAsync(self, veris, nogoodSink):
+    # like evaluateGroup (runs in its own asyncio task)
+    first = veris[0]
+    eatomname, inputtuple = first.groupkey
+    with self.ccontext.evaluating(first, nogoodSink):
+      return await self.eaeval.evaluateAsync(dlvhex.eatoms[eatomname], inputtuple, first.allinputs)
+
+  def evaluateAsyncGroups(self, groups):
+    '''
+    evaluate groups of asynchronous external atoms concurrently on the event loop of this thread
+    returns dict with key = index in groups and value = (result of evaluateGroup, list of learned nogoods)
+    '''
+    candidates = [ gidx for gidx, veris in enumerate(groups)
+                   if dlvhex.eatoms[veris[0].eatomname].isasync and not self.eaeval.runsInWorker(dlvhex.eatoms[veris[0].eatomname]) ]
+    if len(candidates) < 2:
+      # nothing to overlap
+      return {}
+    sinks = [ [] for _ in candidates ]
+    async def evaluateAll():
+      return await asyncio.gather(
+        *[ self.evaluateGroupAsync(groups[gidx], sink) for gidx, sink in zip(candidates, sinks) ],
+        return_exceptions=True)
+    results = self.eaeval.runAsync(evaluateAll())
+    for result in results:
+      if isinstance(result, BaseException):
+        raise result
+    return { gidx: (result, sink) for gidx, result, sink in zip(candidates, results, sinks) }
+
+  def _evaluateGroupInWorker(self, control, veris, nogoodSink, cancelled):
+    # runs in a thread of self.pool while the solver thread waits in check()
+    if cancelled.is_set():
+      return None
+    with self.ccontext(control, self):
+      return self.evaluateGroup(veris, nogoodSink)
+
+  def startConcurrentEvaluations(self, control, groups):
+    '''
+    submit evaluations of groups of thread-safe external atoms to the thread pool
+    returns (dict with key = index in groups and value = (future, list of learned nogoods), cancellation event)
+    '''
+    futures = {}
+    cancelled = threading.Event()
+    if self.pool is None:
+      return futures, cancelled
+    candidates = [ gidx for gidx, veris in enumerate(groups) if self._concurrentInThread(dlvhex.eatoms[veris[0].eatomname]) ]
+    if len(candidates) < 2:
+      # nothing to overlap
+      return futures, cancelled
+    for gidx in candidates:
+      sink = []
+      futures[gidx] = (self.pool.submit(self._evaluateGroupInWorker, control, groups[gidx], sink, cancelled), sink)
+    return futures, cancelled
+
+  def _concurrentInThread(self, holder):
+    # calls in worker processes are independent, other external atoms must be thread-safe (and not asynchronous)
+    if self.eaeval.runsInWorker(holder):
+      return True
+    return holder.props.threadsafe and not holder.isasync
+
+  def finishConcurrentEvaluations(self, futures, cancelled):
+    '''
+    cancel evaluations that did not start and wait for running ones
+    (workers must not use the control object after check() returns)
+    '''
+    cancelled.set()
+    for future, _ in futures.values():
+      future.cancel()
+    concurrent.futures.wait([ future for future, _ in futures.values() ])
+
+  def verifyTruthOfAtoms(self, control, state, veris, result=None):
+    '''
+    evaluate the external atom of a group of verifications (same external atom and input tuple) once
+    (unless result of evaluateGroup is given),
+    check the guess of each verification, and add input/output nogoods for all wrong guesses
+    returns the list of verifications where the guess was verified
+    and the list of verifications where the external atom gave the output tuple as unknown
+    '''
     name = self.name+'vTOA:'
-    targetValue = control.assignment.is_true(veri.replacement.lit)
+    first = veris[0]
+    eatomname, inputtuple = first.groupkey
+    holder = dlvhex.eatoms[eatomname]
     if __debug__:
-      idebug = repr([ x.value() for x in veri.allinputs if x.isTrue() ])
-      logging.info(name+' checking if {} = {} with interpretation {} ({})'.format(
-        str(targetValue), veri.replacement.sym, idebug,
+      idebug = repr([ x.value() for x in first.allinputs if x.isTrue() ])
+      logging.info(name+' checking {} with interpretation {} ({})'.format(
+        repr([ (control.assignment.is_true(veri.replacement.lit), str(veri.replacement.sym)) for veri in veris ]), idebug,
         {True:'total', False:'partial'}[control.assignment.is_total]))
-    holder = dlvhex.eatoms[eatomname]
-    # in replacement atom everything that is not output is relevant input
-    replargs = veri.replacement.sym.arguments
-    inputtuple = tuple(replargs[0:len(replargs)-holder.outnum])
-    outputtuple = tuple(replargs[len(replargs)-holder.outnum:len(replargs)])
-    logging.info(name+' inputtuple {} outputtuple {}'.format(repr(inputtuple), repr(outputtuple)))
-    self.currentVerification = veri
-    try:
-      outKnownTrue, outUnknown = self.eaeval.evaluate(holder, inputtuple, veri.allinputs)
-    finally:
-      self.currentVerification = None
-    logging.debug(name+" outputtuple {} outTrue {} outUnknown {} targetValue of {} = {}".format(repr(outputtuple), repr(outKnownTrue), repr(outUnknown), str(veri.replacement.sym), targetValue))
-
-    if outputtuple in outUnknown:
-      # cannot verify
-      logging.info("%s external atom gave tuple %s as unknown -> cannot verify", name, outputtuple)
-      return
+    logging.info(name+' inputtuple {} outputtuples {}'.format(repr(inputtuple), repr([ veri.outputtuple for veri in veris ])))
+    if result is None:
+      result = self.evaluateGroup(veris)
+    outKnownTrue, outUnknown, accessed = result
+    logging.debug(name+" outTrue {} outUnknown {}".format(repr(outKnownTrue), repr(outUnknown)))
+    outKnownTrue, outUnknown = frozenset(outKnownTrue), frozenset(outUnknown)
+
+    verified = []
+    undecided = []
+    nogoods = []
+    # the input part of input/output nogoods is the same for all verifications in the group
+    # (it depends on the real value if the external atom has (anti)monotonic inputs)
+    # key = realValue, value = Nogood
+    inputnogoods = {}
+    for veri in veris:
+      outputtuple = veri.outputtuple
+      targetValue = control.assignment.is_true(veri.replacement.lit)
+      if outputtuple in outUnknown:
+        # cannot verify
+        logging.info("%s external atom gave tuple %s as unknown -> cannot verify", name, outputtuple)
+        undecided.append(veri)
+        continue
+
+      realValue = outputtuple in outKnownTrue
+      self.observe(veri, realValue)
+
+      if realValue == targetValue:
+        logging.info("%s verified %s = &%s[%s](%s)", name, targetValue, eatomname, inputtuple, outputtuple)
+        verified.append(veri)
+        continue
+      else:
+        # this just means the guess was wrong, this "failure to verify" is not an error!
+        logging.info("%s failed %s = &%s[%s](%s)", name, targetValue, eatomname, inputtuple, outputtuple)
+
+      # add clause that ensures this value is always chosen correctly in the future
+      # clause contains veri.relevance.lit, veri.replacement.lit and negation of all atoms in
+
+      if not holder.props.doInputOutputLearning:
+        # this breaks the search if the external atom does not provide at least one nogood that declares this answer set invalid!
+        logging.info("%s not performing input/output learning due to configuration", name)
+        continue
+
+      if realValue not in inputnogoods:
+        inputnogoods[realValue] = self._inputNogood(control, first, accessed, realValue)
+      inputnogood = inputnogoods[realValue]
+      if inputnogood is None:
+        # opposite literals, no input/output nogood possible
+        continue
+      nogood = self._inputOutputNogood(control, state, veri, realValue, inputnogood)
+      if nogood is not None:
+        nogoods.append(nogood)
+        if len(veri.monotonic) > 0 or len(veri.antimonotonic) > 0:
+          # this nogood also decides the truth for other interpretations, remember it to skip evaluations
+          state.decidingNogoods(veri)[1 if realValue else 0].add(frozenset(inputnogood.literals | set([veri.relevance.lit])))
 
-    # TODO handle all outputs in outputtuple, not only the one that is relevant to the next line
-    realValue = outputtuple in outKnownTrue
+    # defer=False to make sure that we abort investigating this answer set candidate as soon as possible
+    # and do not waste computing external atoms on a candidate that is for sure not an answer set
+    # lock=False to permit the solver to delete the nogood later (these nogoods only serve to invalidate the current result)
+    for idx, nogood in enumerate(nogoods):
+      try:
+        self.recordNogood(nogood, defer=False, lock=False)
+      except ClingoPropagator.StopPropagation:
+        # we cannot add more nogoods in this conflict, the solver gets the others later
+        for othernogood in nogoods[idx+1:]:
+          self.recordNogood(othernogood, defer=True, lock=False)
+        raise
+    return verified, undecided
 
-    if realValue == targetValue:
-      logging.info("%s verified %s = &%s[%s](%s)", name, targetValue, eatomname, inputtuple, outputtuple)
-      return
+  def _inputNogood(self, control, veri, accessed, realValue):
+    '''
+    build the input part of the input/output nogood
+    from the inputs read by the external atom (accessed symbols) or from all inputs (if accessed is None)
+    for monotonic inputs only true (if realValue) or false (otherwise) inputs are required
+    (and vice versa for antimonotonic inputs)
+    returns None if this is not possible
+    '''
+    # inputs where the value does not matter: the real value stays the same if they change
+    if realValue:
+      irrelevantTrue, irrelevantFalse = veri.antimonotonic, veri.monotonic
     else:
-      # this just means the guess was wrong, this "failure to verify" is not an error!
-      logging.info("%s failed %s = &%s[%s](%s)", name, targetValue, eatomname, inputtuple, outputtuple)
-
-    # add clause that ensures this value is always chosen correctly in the future
-    # clause contains veri.relevance.lit, veri.replacement.lit and negation of all atoms in
-
-    if not holder.props.doInputOutputLearning:
-      # this breaks the search if the external atom does not provide at least one nogood that declares this answer set invalid!
-      logging.info("%s not performing input/output learning due to configuration", name)
-      return
-
-    # build naive input/output nogood
-    # this invalidates the current answer set candidate
-    
+      irrelevantTrue, irrelevantFalse = veri.monotonic, veri.antimonotonic
     nogood = self.Nogood()
-    hr_nogood = []
+    lits = veri.inputs.literals
+    if accessed is not None:
+      lits = veri.inputs.literalsOf(accessed)
+      if lits is None:
+        logging.info(self.name+" input nogood uses all inputs (external atom read unknown atoms)")
+        lits = veri.inputs.literals
     # solution is eliminated if all inputs are as they were above ...
-    for atom in veri.allinputs:
-      value = control.assignment.value(atom.symlit.lit)
+    for lit in lits:
+      value = control.assignment.value(lit)
       if value == True:
-        hr_nogood.append( (atom.symlit.sym,True) )
-        if not nogood.add(atom.symlit.lit):
-          logging.warning(name+" cannot build nogood (opposite literals)!")
-          return
+        if lit in irrelevantTrue:
+          continue
+        if not nogood.add(lit):
+          logging.warning(self.name+" cannot build nogood (opposite literals)!")
+          return None
       elif value == False:
-        hr_nogood.append( (atom.symlit.sym,False) )
-        if not nogood.add(-atom.symlit.lit):
-          logging.warning(name+" cannot build nogood (opposite literals)!")
-          return
+        if lit in irrelevantFalse:
+          continue
+        if not nogood.add(-lit):
+          logging.warning(self.name+" cannot build nogood (opposite literals)!")
+          return None
       # None case does not contribute to nogood
+    return nogood
+
+  def _inputOutputNogood(self, control, state, veri, realValue, inputnogood):
+    '''
+    build naive input/output nogood from input part
+    this invalidates the current answer set candidate
+    returns None if this is not possible or not necessary
+    '''
+    nogood = self.Nogood()
+    nogood.literals = set(inputnogood.literals)
 
     # ... if the atom was relevant ...
     if not nogood.add(veri.relevance.lit):
       logging.warning("cannot add relevance to  i/o nogood (opposing literal)!")
-      return
+      return None
 
     # important: check this _before_ adding replacement literal
-    if self._inputOutputNogoodSubsumedByLearnedNogood(veri.nogoods, realValue, nogood):
+    if self._inputOutputNogoodSubsumedByLearnedNogood(state.learnedNogoods(veri), realValue, nogood):
       logging.info(self.name+"CPvTOA omitting nogood (subsumed)!")
-      return
+      return None
 
     checklit = None
     if realValue == True:
       # ... and if computation gave true but eatom replacement is false
       checklit = -veri.replacement.lit
-      hr_nogood.append( (veri.replacement.sym,False) )
     else:
       # ... and if computation gave false but eatom replacement is true
       checklit = veri.replacement.lit
-      hr_nogood.append( (veri.replacement.sym,True) )
 
     if not nogood.add(checklit):
       logging.warning(self.name+"CPvTOA cannot build nogood (opposite literals)!")
-      return
+      return None
 
     if logging.getLogger().isEnabledFor(logging.INFO):
-      hr_nogood_str = repr([ {True:'',False:'-'}[sign]+str(x) for x, sign in hr_nogood ])
-      logging.info("%s CPcheck adding input/output nogood %s", name, hr_nogood_str)
-    # defer=False to make sure that we abort investigating this answer set candidate as soon as possible
-    # and do not waste computing external atoms on a candidate that is for sure not an answer set
-    # lock=False to permit the solver to delete the nogood later (these nogoods only serve to invalidate the current result)
-    self.recordNogood(nogood, defer=False, lock=False)
+      hr_nogood_str = repr([ {True:'',False:'-'}[lit > 0]+repr(self.dbgSolv2Syms.get(abs(lit), abs(lit))) for lit in nogood.literals ])
+      logging.info("%s CPcheck adding input/output nogood %s", self.name, hr_nogood_str)
+    return nogood
 
   def _inputOutputNogoodSubsumedByLearnedNogood(self, veri_nogoods, realValue, nogood):
-    # veri_nogoods -> see EAtomVerification.__init__ comments
+    # veri_nogoods -> see ThreadState.__init__ comments
     if realValue == True:
       vngds = veri_nogoods[1]
     else:
@@ -863,12 +1976,11 @@ class ClingoPropagator:
     # nogood _also_ does not contain a replacement literal at this point
     # (where this method is called)
 
-    for vng in vngds:
-      # vng is a frozenset of integers (solver literals)
-      # nogood is a Nogood -> nogood.literals is a set of integers (solver literals)
-      if vng.issubset(nogood.literals):
-        logging.info("learned nogood %s subsumes nogood %s", list(vng), nogood)
-        return True
+    # nogood is a Nogood -> nogood.literals is a set of integers (solver literals)
+    vng = vngds.subsuming(nogood.literals)
+    if vng is not None:
+      logging.info("learned nogood %s subsumes nogood %s", list(vng), nogood.literals)
+      return True
 
     return False
 
@@ -882,7 +1994,10 @@ class ClingoPropagator:
         logging.debug(name+"  {} ({}) is {}".format(a, self.ccontext.propcontrol.assignment.value(a), repr(self.dbgSolv2Syms[a])))
     if defer:
       # do not add nogood here, but record in list so that propagator can later add them
-      self.nogoodsToAdd.append(nogood)
+      sink = self.ccontext.nogoodSink
+      if sink is None:
+        sink = self.currentThreadState().nogoodsToAdd
+      sink.append( (nogood, lock) )
     else:
       # add (potentially raises StopPropagation)
       self.addNogood(nogood, lock)
@@ -892,11 +2007,12 @@ class ClingoPropagator:
     add nogoods to the solver that were recorded in an external atom call and propagate
     if nogood requires end of propagation, throw StopPropagation
     '''
-    logging.debug("addPendingNogoodsOrThrow has %d nogoods to add", len(self.nogoodsToAdd))
-    while len(self.nogoodsToAdd) > 0:
+    nogoodsToAdd = self.currentThreadState().nogoodsToAdd
+    logging.debug("addPendingNogoodsOrThrow has %d nogoods to add", len(nogoodsToAdd))
+    while len(nogoodsToAdd) > 0:
       # get next nogood from queue
-      ng = self.nogoodsToAdd.pop(0)
-      self.addNogood(ng)
+      ng, lock = nogoodsToAdd.pop(0)
+      self.addNogood(ng, lock)
 
   def addNogood(self, nogood, lock=True):
     # low-level add of nogood and abort of propagation if required
@@ -910,6 +2026,88 @@ class ClingoPropagator:
       raise ClingoPropagator.StopPropagation()
 
 
+class ReplacementHeuristic:
+  '''
+  estimates the truth of replacement atoms from earlier evaluations and from decision hints of plugins
+  (shared by all propagators and solver threads, counts are approximate if threads update them concurrently)
+  '''
+  # weight of the prior (hint or other ground atoms of the same external atom) in number of observations
+  PRIOR_WEIGHT = 2
+
+  def __init__(self, ccontext):
+    self.ccontext = ccontext
+    # key = replacement symbol, value = [number of evaluations to false, number of evaluations to true]
+    self.observed = {}
+    # key = eatom name, value = [number of evaluations to false, number of evaluations to true]
+    self.observedByEAtom = collections.defaultdict(lambda: [0, 0])
+    # key = replacement symbol, value = probability given by the decision hint of the plugin (or None)
+    self.hints = {}
+
+  def observe(self, veri, realValue):
+    counts = self.observed.get(veri.replacement.sym, None)
+    if counts is None:
+      counts = self.observed[veri.replacement.sym] = [0, 0]
+    counts[1 if realValue else 0] += 1
+    self.observedByEAtom[veri.eatomname][1 if realValue else 0] += 1
+
+  def hint(self, veri):
+    if veri.replacement.sym not in self.hints:
+      hint = dlvhex.eatoms[veri.eatomname].props.decisionHint
+      if hint is not None:
+        termID = self.ccontext.termID
+        hint = hint(tuple([ termID(x) for x in veri.inputtuple ]), tuple([ termID(x) for x in veri.outputtuple ]))
+      self.hints[veri.replacement.sym] = hint
+    return self.hints[veri.replacement.sym]
+
+  def estimate(self, veri):
+    '''
+    returns the estimated probability that the replacement atom of veri is true (or None)
+    '''
+    prior = self.hint(veri)
+    if prior is None:
+      byEAtom = self.observedByEAtom.get(veri.eatomname, None)
+      if byEAtom is not None:
+        prior = (byEAtom[1] + 1) / (byEAtom[0] + byEAtom[1] + 2)
+    false, true = self.observed.get(veri.replacement.sym, (0, 0))
+    if prior is None:
+      if false + true == 0:
+        return None
+      return true / (false + true)
+    return (prior*self.PRIOR_WEIGHT + true) / (self.PRIOR_WEIGHT + false + true)
+
+class HeuristicClingoPropagator(ClingoPropagator):
+  '''
+  ClingoPropagator that decides replacement atoms with the sign estimated by a ReplacementHeuristic
+  (a separate class because clingo calls decide() for each decision if the method exists)
+  '''
+  def __init__(self, config, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms, pool, heuristic):
+    ClingoPropagator.__init__(self, config, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms, pool)
+    self.heuristic = heuristic
+
+  def init(self, init):
+    ClingoPropagator.init(self, init)
+    # key = positive solver literal of replacement atom, value = EAtomVerification
+    self.verificationsByDecision = {}
+    for veri in self.verifications:
+      lit = veri.replacement.lit
+      if lit > 0 and not init.assignment.is_fixed(lit):
+        self.verificationsByDecision.setdefault(lit, veri)
+
+  def observe(self, veri, realValue):
+    self.heuristic.observe(veri, realValue)
+
+  def decide(self, thread_id, assignment, fallback):
+    veri = self.verificationsByDecision.get(abs(fallback), None)
+    if veri is None:
+      return fallback
+    estimate = self.heuristic.estimate(veri)
+    if estimate is None or estimate == 0.5:
+      return fallback
+    lit = veri.replacement.lit if estimate > 0.5 else -veri.replacement.lit
+    if lit != fallback:
+      self.pcontext.stats.count('heuristic-sign-changed')
+    return lit
+
 class ClingoModel(dlvhex.Model):
   '''
   This class wraps a clingo model and provides the shown atoms to dlvhex for display.
@@ -922,83 +2120,171 @@ class ClingoModel(dlvhex.Model):
         return ClingoID(ccontext, SymLit(x, mdl.context.symbolic_atoms[x].literal))
       else:
         # symbols from #show statements
-        return ClingoID(ccontext, SymLit(x, None))
+        return ccontext.termID(x)
     idlist = [ idmaker(x) for x in mdl.symbols(shown=True) ]
     dlvhex.Model.__init__(self,
       atoms=frozenset(idlist),
       cost=mdl.cost,
       is_optimal=True if mdl.optimality_proven or len(mdl.cost) == 0 else False)
 
-def execute(pcontext, rewritten, facts, plugins, config, model_callbacks):
-  propagatorFactory = None
-  flpchecker = None
-  cmdlineargs = None
-  with pcontext.stats.context('preparation'):
-    # prepare contexts that are for this program but not yet specific for a clasp solver process
-    # (multiple clasp solvers are used for finding compatible sets and for checking FLP property)
-
+class Execution:
+  '''
+  contexts that are for this program but not yet specific for a clasp solver process
+  (multiple clasp solvers are used for finding compatible sets and for checking FLP property)
+  '''
+  def __init__(self, pcontext, plugins, config):
     # preparing clasp context which does not hold concrete clasp information yet
     # (such information is added during propagation)
-    ccontext = ClaspContext()
+    self.ccontext = ClaspContext()
+
+    # worker processes for external atoms of selected plugins
+    self.workers = None
+    if len(config.process_plugins) > 0:
+      unknown = set(config.process_plugins) - set([ p.mname for p in plugins ])
+      if len(unknown) > 0:
+        logging.warning("plugins %s given with --process-plugin are not loaded", sorted(unknown))
+      workerplugins = [ p for p in plugins if p.mname in config.process_plugins ]
+      if len(workerplugins) > 0:
+        self.workers = eatomprocesses.WorkerPool(config, workerplugins, pcontext.stats)
 
     # preparing evaluator for external atoms which needs to know the clasp context
     if config.enable_generic_eatom_cache:
-      eaeval = CachedEAtomEvaluator(config, ccontext, pcontext.stats)
+      self.eaeval = CachedEAtomEvaluator(config, self.ccontext, pcontext.stats, self.workers)
     else:
-      eaeval = EAtomEvaluator(config, ccontext, pcontext.stats)
+      self.eaeval = EAtomEvaluator(config, self.ccontext, pcontext.stats, self.workers)
 
     # find names of external atoms that advertises to do checks on a partial assignment
     partial_evaluation_eatoms = [ eatomname for eatomname, info in dlvhex.eatoms.items() if info.props.provides_partial ]
     # XXX we could filter here to reduce this set or we could decide to do no partial evaluation at all or we could do this differently for FLP checker and Compatible Set finder
     should_do_partial_evaluation_on = partial_evaluation_eatoms
 
-    propagatorFactory = lambda name: ClingoPropagator(config, name, pcontext, ccontext, eaeval, should_do_partial_evaluation_on)
+    # threads for concurrent evaluation of external atoms in one check (shared by all propagators)
+    self.pool = None
+    if config.eatom_threads > 0:
+      self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=config.eatom_threads, thread_name_prefix='hexlite-eatom')
+
+    ccontext, eaeval, pool = self.ccontext, self.eaeval, self.pool
+    if config.eatom_heuristic:
+      heuristic = ReplacementHeuristic(ccontext)
+      self.propagatorFactory = lambda name: HeuristicClingoPropagator(config, name, pcontext, ccontext, eaeval, should_do_partial_evaluation_on, pool, heuristic)
+    else:
+      self.propagatorFactory = lambda name: ClingoPropagator(config, name, pcontext, ccontext, eaeval, should_do_partial_evaluation_on, pool)
 
     if config.flpcheck == 'explicit':
-      flp_checker_factory = flp.ExplicitFLPChecker
+      self.flp_checker_factory = flp.ExplicitFLPChecker
     else:
       assert(config.flpcheck == 'none')
-      flp_checker_factory = flp.DummyFLPChecker
-    flpchecker = flp_checker_factory(config, propagatorFactory)
+      self.flp_checker_factory = flp.DummyFLPChecker
 
     # TODO get settings from commandline
-    cmdlineargs = []
+    self.cmdlineargs = []
     if config.number != 1:
-      cmdlineargs.append(str(config.number))
+      self.cmdlineargs.append(str(config.number))
     # just in case we need optimization
-    cmdlineargs.append('--opt-mode=optN')
+    self.cmdlineargs.append('--opt-mode=optN')
+    if config.eatom_heuristic_level is not None:
+      # levels of replacement atoms are added after grounding (see addReplacementHeuristics)
+      self.cmdlineargs.append('--heuristic=Domain')
     for a in hexlite.flatten(config.backend_additional_args):
-      cmdlineargs.append(a)
+      self.cmdlineargs.append(a)
 
-  cc = None
-  with pcontext.stats.context('grounding'):
-    logging.info('sending nonground program to clingo control '+repr(cmdlineargs))
-    cc = clingo.Control(cmdlineargs)
-    sendprog = '\n'.join([ shp.shallowprint(x) for x in rewritten ])
-    try:
-      logging.debug('sending program ===\n'+sendprog+'\n===')
-      cc.add('base', (), sendprog)
-    except:
-      raise Exception("error sending program ===\n"+sendprog+"\n=== to clingo:\n"+traceback.format_exc())
+    self.config = config
+
+  def flpChecker(self):
+    return self.flp_checker_factory(self.config, self.propagatorFactory)
 
-    # preparing context for instantiation
-    # (this class is specific to the gringo API)
-    logging.info('grounding with gringo context')
-    ccc = GringoContext(eaeval)
-    flpchecker.attach(cc)
+  def close(self):
+    # e.g., write persistent cache
+    self.eaeval.close()
+    if self.pool is not None:
+      self.pool.shutdown()
+    if self.workers is not None:
+      self.workers.close()
 
-    if config.dump_grounding:
-      cc.register_observer(GroundProgramPrinter(), False)
+def execute(pcontext, rewritten, facts, plugins, config, model_callbacks, execution=None):
+  '''
+  execution: Execution that is used for several calls (e.g., in acthex iterations), it is not closed here
+  '''
+  owner = execution is None
+  if owner:
+    with pcontext.stats.context('preparation'):
+      execution = Execution(pcontext, plugins, config)
+
+  try:
+    if len(pcontext.evaluationUnits) > 1:
+      search = EvaluationUnitSearch(pcontext, config, model_callbacks,
+        execution.cmdlineargs, execution.ccontext, execution.eaeval, execution.propagatorFactory, execution.flpChecker)
+      return search.run()
+    return groundAndSearch(pcontext, rewritten, config, model_callbacks,
+      execution.cmdlineargs, execution.ccontext, execution.eaeval, execution.propagatorFactory, execution.flpChecker())
+  finally:
+    if owner:
+      execution.close()
+
+def addReplacementHeuristics(pcontext, cc, level):
+  '''
+  give all replacement atoms the given level in the domain heuristic
+  '''
+  count = 0
+  with cc.backend() as backend:
+    for eatomname, signatures in pcontext.eatoms.items():
+      for siginfo in signatures:
+        for x in cc.symbolic_atoms.by_signature(siginfo.replacementPred, siginfo.arity):
+          if not x.is_fact:
+            backend.add_heuristic(x.literal, clingo.backend.HeuristicType.Level, level, 1, [])
+            count += 1
+  logging.info('set heuristic level %d for %d replacement atoms', level, count)
 
-    cc.ground([('base',())], ccc)
+def groundProgram(pcontext, rewritten, groundingParts, config, cmdlineargs, eaeval, flpchecker, facts=(), contextFactory=None):
+  '''
+  returns a clingo.Control with the ground program (rewritten rules and facts given as clingo symbols)
+  contextFactory(eaeval, control) creates the context for grounding (default: GringoContext)
+  '''
+  logging.info('sending nonground program to clingo control '+repr(cmdlineargs))
+  cc = clingo.Control(cmdlineargs)
+  # (facts must come before the first #program directive)
+  sendprog = '\n'.join([ str(x)+'.' for x in facts ] + [ shp.shallowprint(x) for x in rewritten ])
+  try:
+    logging.debug('sending program ===\n'+sendprog+'\n===')
+    cc.add('base', (), sendprog)
+  except:
+    raise Exception("error sending program ===\n"+sendprog+"\n=== to clingo:\n"+traceback.format_exc())
+
+  # preparing context for instantiation
+  # (this class is specific to the gringo API)
+  logging.info('grounding with gringo context')
+  if contextFactory is None:
+    contextFactory = GringoContext
+  ccc = contextFactory(eaeval, cc)
+  flpchecker.attach(cc)
+
+  if config.dump_grounding:
+    cc.register_observer(GroundProgramPrinter(), False)
+
+  # parts are grounded one after the other (external atoms can read facts of earlier parts)
+  for part in groundingParts:
+    cc.ground([(part,())], ccc)
+  if config.eatom_heuristic_level is not None:
+    addReplacementHeuristics(pcontext, cc, config.eatom_heuristic_level)
+  return cc
+
+def groundAndSearch(pcontext, rewritten, config, model_callbacks,
+    cmdlineargs, ccontext, eaeval, propagatorFactory, flpchecker):
+  cc = None
+  with pcontext.stats.context('grounding'):
+    cc = groundProgram(pcontext, rewritten, pcontext.groundingParts, config, cmdlineargs, eaeval, flpchecker)
 
-  with pcontext.stats.context('search'):
-    logging.info('preparing for search')
+  # name of this propagator CSF = compatible set finder
+  checkprop = propagatorFactory('CSF')
+  cc.register_propagator(checkprop)
 
-    # name of this propagator CSF = compatible set finder
-    checkprop = propagatorFactory('CSF')
-    cc.register_propagator(checkprop)
+  return solveControl(pcontext, cc, config, model_callbacks, ccontext, flpchecker)
 
+def solveControl(pcontext, cc, config, model_callbacks, ccontext, flpchecker):
+  '''
+  enumerates answer sets of a ground clingo.Control (with registered propagator) and calls model_callbacks
+  '''
+  with pcontext.stats.context('search'):
     logging.info('starting search')
     ret = None
     with cc.solve(yield_=True, async_=False) as handle:
@@ -1039,3 +2325,79 @@ def execute(pcontext, rewritten, facts, plugins, config, model_callbacks):
   logging.info('execute() terminated with result '+repr(ret))
   return ret
 
+
+class EvaluationUnitSearch:
+  '''
+  solves the evaluation units in pcontext.evaluationUnits one after the other
+  * each answer set of a unit becomes facts (atoms of exported predicates) for grounding the next unit
+  * answer sets of the last unit are combined with the answer sets of earlier units they are based on
+  '''
+  class StopSearch(Exception):
+    pass
+
+  def __init__(self, pcontext, config, model_callbacks, cmdlineargs, ccontext, eaeval, propagatorFactory, flpCheckerFactory):
+    self.pcontext = pcontext
+    self.config = config
+    self.model_callbacks = model_callbacks
+    # units enumerate all answer sets (the number of combined answer sets is limited here)
+    if config.number != 1:
+      cmdlineargs = cmdlineargs[1:]
+    self.cmdlineargs = ['0'] + cmdlineargs
+    self.ccontext = ccontext
+    self.eaeval = eaeval
+    self.propagatorFactory = propagatorFactory
+    self.flpCheckerFactory = flpCheckerFactory
+    # number of combined answer sets
+    self.count = 0
+
+  def run(self):
+    ret = None
+    try:
+      self.searchUnit(0, [], frozenset())
+    except modelcallback.StopModelEnumerationException:
+      ret = 'SAT'
+      logging.info("end of enumeration with StopModelEnumerationException")
+    except self.StopSearch:
+      ret = 'SAT'
+    if ret is None:
+      ret = 'SAT' if self.count > 0 else 'UNSAT'
+    logging.info('execute() terminated with result '+repr(ret))
+    return ret
+
+  def searchUnit(self, idx, facts, atoms):
+    '''
+    enumerates answer sets of unit idx
+    facts = symbols exported by earlier units
+    atoms = shown atoms of earlier units
+    '''
+    unit = self.pcontext.evaluationUnits[idx]
+    last = idx+1 == len(self.pcontext.evaluationUnits)
+    flpchecker = self.flpCheckerFactory()
+    with self.pcontext.stats.context('grounding'):
+      cc = groundProgram(self.pcontext, unit.rewritten, unit.groundingParts, self.config, self.cmdlineargs, self.eaeval, flpchecker, facts)
+    with self.pcontext.stats.context('search'):
+      logging.info('starting search in evaluation unit %d with %d input facts', idx, len(facts))
+      cc.register_propagator(self.propagatorFactory('CSF'))
+      with cc.solve(yield_=True, async_=False) as handle:
+        for model in handle:
+          with self.pcontext.stats.context("flpcheck"):
+            flpmodel = flpchecker.checkModel(model)
+          if not flpmodel:
+            logging.debug('discarding model because flpchecker returned False')
+            continue
+          self.pcontext.stats.count('unit{}-answerset'.format(idx))
+          combined = atoms | ClingoModel(self.ccontext, model).atoms
+          if not last:
+            exported = [ x for x in model.symbols(atoms=True) if x.name in unit.exports ]
+            # (the model is not valid after the next iteration)
+            self.searchUnit(idx+1, facts + exported, combined)
+            continue
+          self.count += 1
+          self.pcontext.stats.display('answersetopt')
+          for cb in self.model_callbacks:
+            cb(dlvhex.Model(atoms=combined, cost=[], is_optimal=True))
+          if self.config.number != 0 and self.count >= self.config.number:
+            raise self.StopSearch()
+        res = handle.get()
+        if res.interrupted or res.unknown:
+          raise InterruptedError("clingo solve interrupted or unknown")
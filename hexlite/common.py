@@ -17,7 +17,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import sys, time, collections, logging, argparse, json
+import sys, time, collections, logging, argparse, json, threading
 
 class Configuration:
   def __init__(self):
@@ -39,10 +39,36 @@ class Configuration:
     self.stats = False
     # whether to enable a generic cache for external atom calls
     self.enable_generic_eatom_cache = True
+    # maximum number of entries in the external atom cache (0 = unlimited)
+    self.eatom_cache_max_entries = 100000
+    # maximum estimated size of the external atom cache in bytes (0 = unlimited)
+    self.eatom_cache_max_bytes = 0
+    # filename of persistent cache for deterministic external atoms (None = no persistent cache)
+    self.persistent_eatom_cache = None
     # whether to enable nogoods specified by external atoms (if false, these nogoods are just ignored)
     self.enable_eatom_specified_nogoods = True
     # whether to check before external atom evaluations if a nogood determines the result, and if yes, skip the evaluation
     self.consider_skipping_evaluation_if_nogood_determines_truth = True
+    # whether to split the program into evaluation units that are solved one after the other
+    self.evaluation_units = False
+    # whether to evaluate external atoms in grounding if their predicate inputs are determined before solving
+    self.ground_evaluation = True
+    # whether to build input/output nogoods only from inputs that were read by the external atom
+    self.track_input_access = True
+    # whether the propagator watches literals and checks only external atoms where some literal changed
+    self.incremental_propagation = False
+    # whether the propagator assigns replacement atoms from cached external atom results (when all inputs are assigned)
+    self.cache_propagation = False
+    # whether the solver decides replacement atoms with the sign estimated from evaluation history and hints
+    self.eatom_heuristic = False
+    # level of replacement atoms in the domain heuristic of clasp (None = do not use the domain heuristic)
+    self.eatom_heuristic_level = None
+    # number of threads for concurrent evaluation of thread-safe external atoms in one check (0 = sequential)
+    self.eatom_threads = 0
+    # names of plugin modules whose external atoms are evaluated in worker processes
+    self.process_plugins = []
+    # number of worker processes for these plugins (0 = number of CPUs)
+    self.eatom_processes = 0
     # additional arguments for backend (currently directly given to clingo)
     self.backend_additional_args = []
 
@@ -66,10 +92,36 @@ class Configuration:
       help='Argument to pass to backend. Can be given multiple times to pass multiple arguments.')
     parser.add_argument('--nocache', action='store_true', default=False,
       help='Disable caching of external atom calls.')
+    parser.add_argument('--cache-max-entries', metavar='N', action='store', default=None,
+      help='Maximum number of cached external atom calls, least recently used entries are evicted (0 = unlimited, default 100000).')
+    parser.add_argument('--cache-max-bytes', metavar='N', action='store', default=None,
+      help='Maximum estimated memory of cached external atom calls in bytes, least recently used entries are evicted (0 = unlimited, default).')
+    parser.add_argument('--persistent-cache', metavar='FILE', action='store', default=None,
+      help='Store results of deterministic external atoms (see ExtSourceProperties.setDeterministic) in SQLite database FILE and reuse them in later runs.')
     parser.add_argument('--noeatomlearn', action='store_true', default=False,
       help='Disable processing of nogoods that are generated by external computations.')
     parser.add_argument('--noskipevalfromnogoods', action='store_true', default=False,
       help='Disable skipping of external evaluation based on existing nogoods provided by the external computation. (Use this if you are not sure if eatom nogoods mess up the search space.)')
+    parser.add_argument('--evaluation-units', action='store_true', default=False,
+      help='Split the program into evaluation units that are connected only through external atoms and solve them one after the other (answer sets of a unit are facts for later units).')
+    parser.add_argument('--nogroundevaluation', action='store_true', default=False,
+      help='Do not evaluate external atoms in grounding if their predicate inputs are defined by facts and stratified rules (guess and check them during search instead).')
+    parser.add_argument('--noaccesstracking', action='store_true', default=False,
+      help='Disable tracking which predicate inputs are read by external atoms (input/output nogoods then contain all predicate inputs).')
+    parser.add_argument('--incremental-propagation', action='store_true', default=False,
+      help='Watch relevance, replacement, and predicate input literals and verify only external atoms where some of these literals changed (instead of rescanning all external atoms in each check).')
+    parser.add_argument('--cache-propagation', action='store_true', default=False,
+      help='Assign replacement atoms in propagation (with a reason nogood) when all predicate inputs of the external atom are assigned and the cache holds the result (instead of correcting wrong guesses in checks).')
+    parser.add_argument('--eatom-heuristic', action='store_true', default=False,
+      help='Decide replacement atoms (guessed truth of external atoms) with the truth value that is more likely according to earlier evaluations and decision hints of plugins (see ExtSourceProperties.setDecisionHint).')
+    parser.add_argument('--eatom-heuristic-level', metavar='N', action='store', default=None,
+      help='Give replacement atoms level N in the domain heuristic of clasp (negative = decide after other atoms, so that they are rather propagated than guessed).')
+    parser.add_argument('--eatom-threads', metavar='N', action='store', default=0,
+      help='Evaluate external atoms that declare themselves thread-safe (see ExtSourceProperties.setThreadSafe) concurrently in N threads within one check (default 0 = sequential).')
+    parser.add_argument('--process-plugin', metavar='MODULENAME', action='append', default=[],
+      help='Evaluate external atoms of this plugin in worker processes (the plugin is loaded in each worker). Can be given multiple times. Combine with --eatom-threads to use several workers within one check.')
+    parser.add_argument('--eatom-processes', metavar='N', action='store', default=0,
+      help='Number of worker processes for plugins given with --process-plugin (default 0 = number of CPUs).')
     parser.add_argument('--dump-grounding', action='store_true', default=False, help='Dump the ground program to STDERR.')
     parser.add_argument('--verbose', action='store_true', default=False, help='Activate verbose mode.')
     parser.add_argument('--debug', action='store_true', default=False, help='Activate debugging mode.')
@@ -103,6 +155,41 @@ class Configuration:
       self.enable_eatom_specified_nogoods = False
     if args.noskipevalfromnogoods:
       self.consider_skipping_evaluation_if_nogood_determines_truth = False
+    self.evaluation_units = args.evaluation_units
+    if args.nogroundevaluation:
+      self.ground_evaluation = False
+    if args.noaccesstracking:
+      self.track_input_access = False
+    self.incremental_propagation = args.incremental_propagation
+    self.cache_propagation = args.cache_propagation
+    self.eatom_heuristic = args.eatom_heuristic
+    try:
+      if args.eatom_heuristic_level is not None:
+        self.eatom_heuristic_level = int(args.eatom_heuristic_level)
+    except:
+      raise ValueError("faulty eatom-heuristic-level argument '{}'".format(args.eatom_heuristic_level))
+    if self.cache_propagation and not self.enable_generic_eatom_cache:
+      logging.warning("cache propagation is not used because caching is disabled")
+      self.cache_propagation = False
+    self.persistent_eatom_cache = args.persistent_cache
+    try:
+      self.eatom_threads = int(args.eatom_threads)
+    except:
+      raise ValueError("faulty eatom-threads argument '{}'".format(args.eatom_threads))
+    self.process_plugins = args.process_plugin
+    try:
+      self.eatom_processes = int(args.eatom_processes)
+    except:
+      raise ValueError("faulty eatom-processes argument '{}'".format(args.eatom_processes))
+    if self.persistent_eatom_cache is not None and not self.enable_generic_eatom_cache:
+      logging.warning("persistent cache is not used because caching is disabled")
+    try:
+      if args.cache_max_entries is not None:
+        self.eatom_cache_max_entries = int(args.cache_max_entries)
+      if args.cache_max_bytes is not None:
+        self.eatom_cache_max_bytes = int(args.cache_max_bytes)
+    except:
+      raise ValueError("faulty cache limit argument '{}'/'{}'".format(args.cache_max_entries, args.cache_max_bytes))
     try:
       if args.maxint:
         self.maxint = int(args.maxint)
@@ -132,25 +219,40 @@ class Plugin:
 class Statistics:
   '''
   collect statistics (real time, cpu time, counter) in categories
+
+  categories are shared, the nesting of categories is tracked separately for each thread
   '''
   def __init__(self):
     self.initial = time.perf_counter(), time.process_time()
     # accumulation of times and counts used in certain categories (real time, cpu time, counter)
     self.categories = collections.defaultdict(lambda: [0.0, 0.0, 0])
+    # protects self.categories
+    self.lock = threading.Lock()
+    # per thread: statstack and latest
+    self.local = threading.local()
     # sequence of categories currently being benchmarked
     # each nesting creates another entry at the end
-    self.statstack = [ 'all' ]
+    self.local.statstack = [ 'all' ]
     # latest time taken
-    self.latest = self.initial
+    self.local.latest = self.initial
+
+  @property
+  def statstack(self):
+    if not hasattr(self.local, 'statstack'):
+      # first use of statistics in another thread (e.g., a clasp solver thread)
+      self.local.statstack = [ 'thread' ]
+      self.local.latest = time.perf_counter(), time.process_time()
+    return self.local.statstack
 
   # not to be used from outside
   def _timestamp(self, addtocategory, increment):
     current = time.perf_counter(), time.process_time()
-    for i in [0, 1]:
-      self.categories[addtocategory][i] += current[i] - self.latest[i]
-    if increment:
-      self.categories[addtocategory][2] += 1
-    self.latest = current
+    with self.lock:
+      for i in [0, 1]:
+        self.categories[addtocategory][i] += current[i] - self.local.latest[i]
+      if increment:
+        self.categories[addtocategory][2] += 1
+    self.local.latest = current
 
   # not to be used from outside
   class _Closure:
@@ -175,6 +277,11 @@ class Statistics:
   def context(self, categoryname):
     return Statistics._Closure(self, categoryname)
 
+  # increment the counter of a category (without measuring time)
+  def count(self, categoryname, increment=1):
+    with self.lock:
+      self.categories[categoryname][2] += increment
+
   def accumulate(self):
     # accumulate some categories
     eatoms = [ v for k,v in self.categories.items() if k.startswith('eatom') ]
@@ -190,13 +297,14 @@ class Statistics:
   def display(self, name):
     # count time difference to last timestamp for statstack[-1] and also count this once
     self._timestamp(self.statstack[-1], increment=True)
-    # accumulate stats
-    accum = self.accumulate()
-    # print stats
-    sys.stderr.write(json.dumps({ 'event':'stats', 'name':name, 'stack': self.statstack, 'categories': dict(self.categories), 'accumulated': accum })+'\n')
-    sys.stderr.flush()
-    # decrement again in case we display() multiple times
-    self.categories[self.statstack[-1]][2] -= 1
+    with self.lock:
+      # accumulate stats
+      accum = self.accumulate()
+      # print stats
+      sys.stderr.write(json.dumps({ 'event':'stats', 'name':name, 'stack': self.statstack, 'categories': dict(self.categories), 'accumulated': accum })+'\n')
+      sys.stderr.flush()
+      # decrement again in case we display() multiple times
+      self.categories[self.statstack[-1]][2] -= 1
 
 # statistics class that does nothing
 class StatisticsDummy:
@@ -212,6 +320,8 @@ class StatisticsDummy:
   
   def context(self, categoryname):
     return StatisticsDummy._Closure()
+  def count(self, categoryname, increment=1):
+    pass
   def display(self, name):
     pass
 
@@ -225,6 +335,10 @@ class ProgramContext:
   def __init__(self):
     # key = eatomname, value = list of SignatureInfo
     self.eatoms = collections.defaultdict(set)
+    # program parts in the order in which they are grounded
+    self.groundingParts = ['base']
+    # list of EvaluationUnit (empty = the whole program is one unit)
+    self.evaluationUnits = []
     self.wroteMaxint = False
     self.stats = StatisticsDummy()
 
@@ -250,5 +364,17 @@ class ProgramContext:
     def __str__(self):
       return "SignatureInfo(rel={},repl={},arity={})".format(self.relevancePred, self.replacementPred, self.arity)
 
+class EvaluationUnit:
+  '''
+  part of the program that is solved separately (see rewriter.EvaluationGraph)
+  '''
+  def __init__(self, rewritten, groundingParts, exports):
+    # rewritten program of this unit
+    self.rewritten = rewritten
+    # program parts in the order in which they are grounded
+    self.groundingParts = groundingParts
+    # predicates whose atoms are given as facts to later units
+    self.exports = exports
+
 def flatten(listoflists):
   return [x for y in listoflists for x in y]
@@ -0,0 +1,439 @@
+# encoding: utf8
+# This module evaluates external atoms of selected plugins in worker processes.
+
+# HEXLite Python-based solver for a fragment of HEX
+# Copyright (C) 2017-2019  Peter Schueller <schueller.p@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+import logging
+import traceback
+import threading
+import queue
+import collections
+import functools
+import asyncio
+import multiprocessing
+
+import dlvhex
+
+# assume that the main program has handled possible import problems
+import clingo
+
+#
+# protocol between main process and worker process (over one pipe per worker)
+#
+# main -> worker: ('evaluate', eatomname, input tuple as strings, layout identifier, layout as strings or None, bytes with value codes, trackAccess)
+#                 None = terminate
+# worker -> main: ('call', Backend method name, arguments)  -> main replies ('ok', result) or ('storeerror', message) or ('error', message)
+#                 ('learn', nogood)                         (no reply)
+#                 ('result', outputKnownTrue, outputUnknown, outputBulk, accessed) or ('exception', traceback)
+#
+# a layout is the sequence of predicate input atoms of an external atom (atoms are sent once per worker and layout)
+# atoms and terms are referenced by their index in a list of IDs in the main process (inputs in layout order, then stored IDs)
+#
+
+# value codes of atoms in the main process (0 = unknown in a partial interpretation)
+VALUECODE = {True:1, False:2, None:0}
+
+# ID sent from worker to main process: index in the list of IDs of the call (or None for a term) and string of the term
+IDRef = collections.namedtuple('IDRef', ['ref', 'negated', 'text'])
+# ID sent from main process to worker: index in the list of IDs of the call, string of the symbol, value code (None for terms)
+IDInfo = collections.namedtuple('IDInfo', ['ref', 'text', 'code'])
+
+# Backend methods that are proxied from the worker to the main process
+PROXIED_METHODS = frozenset([
+  'storeAtom', 'storeOutputAtom', 'getInstantiatedOutputAtoms',
+  'storeConstant', 'storeString', 'storeInteger', 'storeParseable' ])
+
+@functools.lru_cache(maxsize=65536)
+def parseSymbol(text):
+  return clingo.parse_term(text)
+
+class WorkerPool:
+  '''
+  worker processes that load the given plugins and evaluate their external atoms
+
+  each worker evaluates one external atom call at a time
+  (concurrent calls from several threads, e.g., with --eatom-threads, use several workers)
+  '''
+  class Worker:
+    def __init__(self, process, conn):
+      self.process = process
+      self.conn = conn
+      # layout identifiers that were sent to this worker
+      self.layouts = set()
+
+  def __init__(self, config, plugins, stats):
+    self.config = config
+    self.stats = stats
+    # names of plugin modules whose external atoms are evaluated in workers
+    self.modules = frozenset([ p.mname for p in plugins ])
+    # key = tuple of symbols of predicate inputs, value = (layout identifier, atoms as strings)
+    # (predicate inputs are rebuilt in each propagator init, their layout identifiers are reused)
+    self.layouts = {}
+    self.layoutLock = threading.Lock()
+    self.workers = []
+    self.idle = queue.Queue()
+    processes = config.eatom_processes
+    if processes <= 0:
+      processes = os.cpu_count() or 1
+    # spawn (not fork) because clasp solver threads can be running
+    mpcontext = multiprocessing.get_context('spawn')
+    pluginspecs = [ (p.mname, p.arguments) for p in plugins ]
+    for idx in range(processes):
+      conn, childconn = mpcontext.Pipe()
+      process = mpcontext.Process(target=workerMain, name='hexlite-eatom-worker-{}'.format(idx), daemon=True,
+        args=(childconn, list(sys.path), pluginspecs, logging.getLogger().level))
+      process.start()
+      childconn.close()
+      worker = self.Worker(process, conn)
+      self.workers.append(worker)
+      self.idle.put(worker)
+    logging.info("started %d worker processes for external atoms of plugins %s", processes, sorted(self.modules))
+
+  def handles(self, holder):
+    return holder.module.__name__ in self.modules
+
+  def close(self):
+    for worker in self.workers:
+      try:
+        worker.conn.send(None)
+      except OSError:
+        pass
+    for worker in self.workers:
+      worker.process.join(timeout=5)
+      if worker.process.is_alive():
+        worker.process.terminate()
+      worker.conn.close()
+    self.workers = []
+
+  def layoutOf(self, predicateinputatoms):
+    symbols = tuple([ x.symlit.sym for x in predicateinputatoms ])
+    with self.layoutLock:
+      layout = self.layouts.get(symbols, None)
+      if layout is None:
+        layout = (len(self.layouts), [ str(x) for x in symbols ])
+        self.layouts[symbols] = layout
+      return layout
+
+  def evaluate(self, eaeval, holder, inputtuple, predicateinputatoms):
+    '''
+    evaluate the external atom in a worker process
+    the output is stored in dlvhex.currentEvaluation() (started by eaeval)
+    '''
+    ident, atoms = self.layoutOf(predicateinputatoms)
+    values = b''
+    if len(predicateinputatoms) > 0 and eaeval.ccontext.propcontrol is None:
+      # evaluation in grounding (all predicate inputs are facts)
+      values = bytes([ VALUECODE[True] ]*len(predicateinputatoms))
+    elif len(predicateinputatoms) > 0:
+      # read the assignment directly (the worker records accesses)
+      value = eaeval.ccontext.propcontrol.assignment.value
+      values = bytes([ VALUECODE[value(x.symlit.lit)] for x in predicateinputatoms ])
+    # IDs that can be referenced by the worker
+    refs = list(predicateinputatoms)
+    self.stats.count('eatom-process-call')
+    worker = self.idle.get()
+    try:
+      if ident in worker.layouts:
+        atoms = None
+      worker.conn.send(('evaluate', holder.name, [ str(x) for x in inputtuple ], ident, atoms, values,
+                        dlvhex.currentEvaluation().accessed is not None))
+      worker.layouts.add(ident)
+      # first error in the main process (raised after the worker finished the call)
+      error = None
+      while True:
+        message = worker.conn.recv()
+        if message[0] == 'call':
+          worker.conn.send(self.proxyCall(eaeval, refs, message[1], message[2]))
+        elif message[0] == 'learn':
+          try:
+            eaeval.learn([ self.decode(eaeval, refs, x) for x in message[1] ])
+          except Exception as e:
+            error = error or e
+        elif message[0] == 'exception':
+          raise Exception("external atom {} failed in worker process:\n{}".format(holder.name, message[1]))
+        else:
+          assert(message[0] == 'result')
+          break
+    except (EOFError, OSError):
+      raise Exception("worker process {} for external atom {} terminated".format(worker.process.name, holder.name))
+    finally:
+      self.idle.put(worker)
+    if error is not None:
+      raise error
+    _, outKnownTrue, outUnknown, outBulk, accessed = message
+    evaluation = dlvhex.currentEvaluation()
+    decode = lambda x: self.decode(eaeval, refs, x)
+    evaluation.outputKnownTrue = set([ tuple([ decode(x) for x in t ]) for t in outKnownTrue ])
+    evaluation.outputUnknown = set([ tuple([ decode(x) for x in t ]) for t in outUnknown ])
+    evaluation.outputBulk = [ (valuetype, [ tuple([ decode(x) for x in t ]) for t in tuples ]) for valuetype, tuples in outBulk ]
+    if evaluation.accessed is not None:
+      evaluation.accessed.update([ refs[ref].symlit.sym for ref in accessed ])
+
+  def proxyCall(self, eaeval, refs, method, arguments):
+    # execute a Backend method for the worker and return the reply
+    if method not in PROXIED_METHODS:
+      return ('error', "method {} cannot be called from worker process".format(method))
+    try:
+      result = getattr(eaeval, method)(*[ self.decode(eaeval, refs, x) for x in arguments ])
+      return ('ok', self.encode(eaeval, refs, result))
+    except dlvhex.StoreAtomException as e:
+      return ('storeerror', str(e))
+    except Exception as e:
+      logging.debug("proxied call %s failed: %s", method, traceback.format_exc())
+      return ('error', "{} failed in main process: {}".format(method, e))
+
+  def decode(self, eaeval, refs, value):
+    # from worker (IDRef or Python value) to main process (ClingoID or Python value)
+    if isinstance(value, IDRef):
+      if value.ref is None:
+        return eaeval.ccontext.termID(parseSymbol(value.text))
+      x = refs[value.ref]
+      return x.negate() if value.negated else x
+    elif isinstance(value, (tuple, list)):
+      return tuple([ self.decode(eaeval, refs, x) for x in value ])
+    return value
+
+  def encode(self, eaeval, refs, value):
+    # from main process (ClingoID or Python value) to worker (IDInfo or Python value)
+    if isinstance(value, dlvhex.ID):
+      refs.append(value)
+      code = None
+      # (no solver literal: term, or placeholder from storeOutputAtom in grounding)
+      if value.symlit.lit:
+        code = VALUECODE[eaeval.ccontext.propcontrol.assignment.value(value.symlit.lit)]
+      return IDInfo(len(refs)-1, str(value.symlit.sym), code)
+    elif isinstance(value, (tuple, list)):
+      return [ self.encode(eaeval, refs, x) for x in value ]
+    return value
+
+#
+# worker process
+#
+
+class WorkerID(dlvhex.ID):
+  '''
+  the ID class as passed to plugins in a worker process
+  (atoms have the truth value that was sent by the main process)
+  '''
+  __slots__ = ('ref', 'sym', 'code')
+
+  def __init__(self, ref, sym, code):
+    # index in the list of IDs of the call in the main process (None = term that is not known there)
+    self.ref = ref
+    self.sym = sym
+    # VALUECODE of an atom (None = term)
+    self.code = code
+
+  def negate(self):
+    if self.sym.type != clingo.SymbolType.Function:
+      raise Exception("cannot negate non-function symbols!")
+    code = { None: None, 0: 0, 1: 2, 2: 1 }[self.code]
+    return NegatedWorkerID(self.ref, clingo.Function(self.sym.name, self.sym.arguments, not self.sym.positive), code)
+
+  def encoded(self):
+    return IDRef(self.ref, False, str(self.sym))
+
+  def value(self):
+    return str(self.sym)
+
+  def intValue(self):
+    if self.sym.type == clingo.SymbolType.Number:
+      return self.sym.number
+    else:
+      raise Exception('intValue called on ID {} which is not a number!'.format(self.value()))
+
+  def isPositive(self):
+    return self.sym.positive
+
+  def isTrue(self):
+    return self.__truth() == VALUECODE[True]
+
+  def isFalse(self):
+    return self.__truth() == VALUECODE[False]
+
+  def isAssigned(self):
+    return self.__truth() != VALUECODE[None]
+
+  def isInteger(self):
+    return self.sym.type == clingo.SymbolType.Number
+
+  def tuple(self):
+    return tuple([ WorkerID(None, sym, None) for sym in [clingo.Function(self.sym.name)]+self.sym.arguments ])
+
+  def extension(self):
+    if self.sym.type != clingo.SymbolType.Function or self.sym.arguments != []:
+      raise Exception("cannot call extension() on term that is not a constant. was called on {}".format(self.value()))
+    return dlvhex.getInterpretation().true(self.value())
+
+  def __truth(self):
+    if self.code is None:
+      raise Exception("cannot read truth value of term that is not an atom")
+    # remember that the currently evaluated external atom read this input
+    accessed = dlvhex.currentEvaluation().accessed
+    if accessed is not None and self.ref is not None:
+      accessed.add(self.ref)
+    return self.code
+
+  def __str__(self):
+    return self.value()
+
+  def __repr__(self):
+    return "WorkerID({})/{}".format(str(self), self.ref)
+
+  def __hash__(self):
+    return hash(self.sym)
+
+  def __eq__(self, other):
+    if isinstance(other, str):
+      return self.value() == other
+    elif isinstance(other, int) and self.sym.type == clingo.SymbolType.Number:
+      return self.intValue() == other
+    elif isinstance(other, WorkerID):
+      return self.sym == other.sym
+    else:
+      return self.value() == other
+
+class NegatedWorkerID(WorkerID):
+  # negated atom (refers to the negation of the referenced ID in the main process)
+  __slots__ = ()
+
+  def negate(self):
+    positive = WorkerID.negate(self)
+    return WorkerID(positive.ref, positive.sym, positive.code)
+
+  def encoded(self):
+    return IDRef(self.ref, True, str(self.sym))
+
+def encodeValue(value):
+  # from worker (WorkerID or Python value) to main process
+  if isinstance(value, WorkerID):
+    return value.encoded()
+  elif isinstance(value, (tuple, list)):
+    return tuple([ encodeValue(x) for x in value ])
+  return value
+
+def decodeValue(value):
+  # from main process (IDInfo or Python value) to worker
+  if isinstance(value, IDInfo):
+    return WorkerID(value.ref, parseSymbol(value.text), value.code)
+  elif isinstance(value, list):
+    return [ decodeValue(x) for x in value ]
+  return value
+
+class WorkerBackend(dlvhex.Backend):
+  '''
+  dlvhex.Backend in the worker process: store* calls are proxied to the main process
+  '''
+  def __init__(self, conn):
+    self.conn = conn
+
+  def call(self, method, *arguments):
+    self.conn.send(('call', method, encodeValue(arguments)))
+    reply = self.conn.recv()
+    if reply[0] == 'ok':
+      return decodeValue(reply[1])
+    elif reply[0] == 'storeerror':
+      raise dlvhex.StoreAtomException(reply[1])
+    else:
+      raise Exception(reply[1])
+
+  def learn(self, nogood):
+    self.conn.send(('learn', [ encodeValue(x) for x in nogood ]))
+
+  def storeAtom(self, tpl):
+    return self.call('storeAtom', tuple(tpl))
+
+  def storeOutputAtom(self, args, sign):
+    return self.call('storeOutputAtom', tuple(args), sign)
+
+  def getInstantiatedOutputAtoms(self):
+    return self.call('getInstantiatedOutputAtoms')
+
+  def storeConstant(self, s: str):
+    return self.call('storeConstant', s)
+
+  def storeString(self, s: str):
+    return self.call('storeString', s)
+
+  def storeInteger(self, i: int):
+    return self.call('storeInteger', i)
+
+  def storeParseable(self, p: str):
+    return self.call('storeParseable', p)
+
+def workerMain(conn, syspath, plugins, loglevel):
+  '''
+  main function of a worker process: load plugins and evaluate external atoms until receiving None
+  '''
+  sys.path[:] = syspath
+  # (logging can already be configured when the main module of the main process is imported)
+  logging.basicConfig(stream=sys.stderr, format="%(levelname)1s:%(filename)10s:%(lineno)3d:%(message)s")
+  logging.getLogger().setLevel(loglevel)
+  for mname, arguments in plugins:
+    pmodule = __import__(mname, globals(), locals(), [], 0)
+    dlvhex.startRegistration(pmodule)
+    if arguments:
+      pmodule.register(arguments)
+    else:
+      pmodule.register()
+  backend = WorkerBackend(conn)
+  # key = layout identifier, value = list of atom symbols
+  layouts = {}
+  while True:
+    try:
+      message = conn.recv()
+    except EOFError:
+      break
+    if message is None:
+      break
+    _, eatomname, inputtuple, ident, atoms, values, trackAccess = message
+    if atoms is not None:
+      layouts[ident] = [ parseSymbol(x) for x in atoms ]
+    try:
+      conn.send(evaluateInWorker(backend, dlvhex.eatoms[eatomname], inputtuple, layouts.get(ident, []), values, trackAccess))
+    except Exception:
+      conn.send(('exception', traceback.format_exc()))
+  conn.close()
+
+def evaluateInWorker(backend, holder, inputtuple, atoms, values, trackAccess):
+  inputs = [ WorkerID(idx, sym, code) for idx, (sym, code) in enumerate(zip(atoms, values)) ]
+  input_arguments = []
+  for spec_idx, inp in enumerate(holder.inspec):
+    if inp in [dlvhex.PREDICATE, dlvhex.CONSTANT]:
+      input_arguments.append(WorkerID(None, parseSymbol(inputtuple[spec_idx]), None))
+    else:
+      assert(inp == dlvhex.TUPLE)
+      input_arguments.append(tuple([ WorkerID(None, parseSymbol(x), None) for x in inputtuple[spec_idx:] ]))
+  dlvhex.startExternalAtomCall(input_arguments, inputs, backend, holder, trackAccess)
+  try:
+    if holder.isasync:
+      asyncio.run(holder.func(*input_arguments))
+    else:
+      holder.func(*input_arguments)
+    evaluation = dlvhex.currentEvaluation()
+    accessed = None
+    if evaluation.accessed is not None:
+      accessed = list(evaluation.accessed)
+    return ('result',
+      [ encodeValue(t) for t in evaluation.outputKnownTrue ],
+      [ encodeValue(t) for t in evaluation.outputUnknown ],
+      [ (valuetype, [ encodeValue(t) for t in tuples ]) for valuetype, tuples in evaluation.outputBulk ],
+      accessed)
+  finally:
+    dlvhex.cleanupExternalAtomCall()
@@ -75,6 +75,8 @@ class GroundProgramObserver:
     self.replatoms = set()
     # atoms in choice rule heads that are not replatoms (set of int)
     self.chatoms = set()
+    # clingo externals, their truth is given and not derived (set of int)
+    self.externals = set()
 
     # weight rules and normal rules are stored together, distinguished by first tuple element
     # normal rule (0,choice,head,body)
@@ -97,6 +99,8 @@ class GroundProgramObserver:
     self.waitingForStuff = True
     self.preliminaryrules = []
     self.preliminaryweightrules = []
+    # number of steps that added rules (programs built from an earlier revision are outdated)
+    self.revision = 0
 
   def init_program(self, incr):
     logging.debug("GPInit")
@@ -104,8 +108,13 @@ class GroundProgramObserver:
   def begin_step(self):
     logging.debug("GPBeginStep")
     self.waitingForStuff = True
+    # (later steps of a multi-shot control may only assign externals)
+    self.preliminaryrules = []
+    self.preliminaryweightrules = []
   def end_step(self):
     logging.debug("GPEndStep")
+    if len(self.preliminaryrules) > 0 or len(self.preliminaryweightrules) > 0:
+      self.revision += 1
     # auxatoms
     self.extractAuxAtoms()
     # atoms
@@ -134,6 +143,9 @@ class GroundProgramObserver:
   def weight_rule(self, choice, head, lower_bound, body):
     logging.debug("GPWeightRule ch=%s hd=%s lb=%s, b=%s", repr(choice), repr(head), repr(lower_bound), repr(body))
     self.preliminaryweightrules.append( (choice, head, lower_bound, body) )
+  def external(self, atom, value):
+    logging.debug("GPExternal atm=%s val=%s", repr(atom), repr(value))
+    self.externals.add(atom)
   def output_atom(self, symbol, atom):
     logging.debug("GPAtom symb=%s atm=%s", repr(symbol), repr(atom))
     if atom == 0:
@@ -378,9 +390,11 @@ class CheckOptimizedProgram:
   Let $djrules \subseteq rules$ be all non-choice rules (normal and weight rules).
     [assumption: disjunctive rules never have replatoms in their head]
 
+  Let $externals \subseteq atoms$ be clingo externals (their truth is given from outside, e.g., by acthex.engine).
+
   Then the set of \emph{counter-model atoms} is the set
-    $cmatoms = atoms \setminus replatoms \cup { CHAUX(b) | b \in chatoms }$
-  which contains original atoms without external atom replacements,
+    $cmatoms = atoms \setminus (replatoms \cup externals) \cup { CHAUX(b) | b \in chatoms }$
+  which contains original atoms without external atom replacements and clingo externals,
     plus auxiliaries for all atoms in (non-replacement rule) choice heads.
 
   Then the check program contains:
@@ -405,6 +419,9 @@ class CheckOptimizedProgram:
   (IX) For each choice rule $r_i = { ch_1 ; ... ; ch_n } :- BODY$ with $r_i \in chrules$:
     ch_i | AUX_CH(ch_i).  for all i \in 1,...,n
     [Without condition, for a choice head atom there is a disjunctive guess].
+  (X) A guess for each clingo external $x \in externals$:
+    { x }.
+    (These truths will be fully determined by a solver assumption to their value in the compatible set.)
 
   The purpose of this program is to check if the FLP reduct has a model that is smaller than the original compatible set.
 
@@ -450,7 +467,7 @@ class CheckOptimizedProgram:
     # compute cmatoms (strings of all atoms relevant for compatible set)
     self.cmatoms = [ self.po.formatAtom(iatom)
                      for iatom in self.po.atoms
-                     if iatom not in self.po.replatoms ]
+                     if iatom not in self.po.replatoms and iatom not in self.po.externals ]
     self.cmatoms += self.chauxatoms.values()
     if __debug__:
       logging.debug('cmatoms '+repr(self.cmatoms))
@@ -483,13 +500,15 @@ class CheckOptimizedProgram:
     chrules = [ self.po.formatAtom(iatm)+'|'+self.chauxatoms[iatm]+'.'
                 for rule in self.po.chrules
                 for iatm in rule[2] ]
+    # (X)
+    extguess = [ '{'+self.po.formatAtom(iatm)+'}.' for iatm in self.po.externals ]
 
     # transform cmatoms into clingo terms of the compatible set auxiliaries
     # (we no longer need them in their original form)
     # (we will need them in this way for the assumptions)
     #self.cmatoms = [ clingo.parse_term(a) for a in self.cmatoms ]
 
-    return rhguess + csguess + atomguess + ensureng + defsmaller + needsmaller + sfacts + allrules + chrules
+    return rhguess + csguess + atomguess + ensureng + defsmaller + needsmaller + sfacts + allrules + chrules + extguess
 
   def _assumptionFromActiveRules(self, activeRules):
     # activeRules is a set of integers (indices into self.po.allrules)
@@ -512,6 +531,10 @@ class CheckOptimizedProgram:
     for iatm, atm in self.po.int2atom.items():
       if iatm in self.po.replatoms:
         continue
+      if iatm in self.po.externals:
+        # clingo externals keep their value
+        ret.append( (atm, mdl.contains(atm)) )
+        continue
       # TODO cache csAtom <-> iatm
       csAtom = clingo.parse_term(prefixAtom(str(atm), Aux.CSATOM))
       # TODO maybe use is_true here too (iatm) TODO benchmark this
@@ -600,6 +623,8 @@ class ExplicitFLPChecker(FLPCheckerBase):
     # because we cannot force clingo to finish instantiation without running solve()
     self.__checkProgram = None
     self.__programObserver = None
+    # revision of the ground program in the programs above
+    self.__revision = None
     # logging granularity
     self.verbose = config.verbose
     self.debug = config.debug
@@ -629,6 +654,11 @@ class ExplicitFLPChecker(FLPCheckerBase):
         if lit in po.replatoms and mdl.is_true(lit)])))
       logging.debug("  Auxiliary Atoms:"+repr(sorted([
         str(lit) for lit in po.auxatoms if mdl.is_true(lit)])))
+    if self.__revision != self.__programObserver.revision:
+      # (first check or a later step of a multi-shot control added rules)
+      self.__ruleActivityProgram = None
+      self.__checkProgram = None
+      self.__revision = self.__programObserver.revision
     ruleActivityProgram = self.ruleActivityProgram()
     activeRules = ruleActivityProgram.getActiveRulesForModel(mdl)
     if self.debug:
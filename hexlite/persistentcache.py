@@ -0,0 +1,105 @@
+# encoding: utf8
+# This module provides a persistent (on-disk) cache for results of external atom calls.
+
+# HEXLite Python-based solver for a fragment of HEX
+# Copyright (C) 2017-2019  Peter Schueller <schueller.p@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import hashlib
+import json
+import sqlite3
+import threading
+
+import clingo
+
+class PersistentEAtomCache:
+  '''
+  SQLite database that stores results of external atom calls across runs
+
+  keys are hashes of
+  * plugin module name and version (module attribute __version__)
+  * eatom name
+  * input tuple
+  * true, false, and unknown predicate inputs
+    (results of partial evaluations must not be reused for other interpretations)
+
+  values are output tuples (known true and unknown) and inputs read by the external atom
+  all terms are stored as strings and parsed with clingo
+  '''
+  # commit to disk after so many new entries (and when closing)
+  COMMIT_INTERVAL = 100
+
+  def __init__(self, filename):
+    self.filename = filename
+    # the cache is shared between solver threads
+    self.lock = threading.Lock()
+    self.db = sqlite3.connect(filename, check_same_thread=False)
+    self.db.execute('CREATE TABLE IF NOT EXISTS eatomcache (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    self.uncommitted = 0
+    logging.info("opened persistent external atom cache %s", filename)
+
+  @staticmethod
+  def key(holder, inputtuple, trueinputs, falseinputs, unknowninputs):
+    '''
+    holder: dlvhex.ExternalAtomHolder
+    inputtuple: tuple of clingo symbols
+    trueinputs, falseinputs, unknowninputs: collections of clingo symbols
+    '''
+    module = holder.module.__name__
+    version = str(getattr(holder.module, '__version__', ''))
+    content = json.dumps([
+      module, version, holder.name,
+      [ str(x) for x in inputtuple ],
+      sorted([ str(x) for x in trueinputs ]),
+      sorted([ str(x) for x in falseinputs ]),
+      sorted([ str(x) for x in unknowninputs ]) ])
+    return hashlib.sha256(content.encode('utf8')).hexdigest()
+
+  def get(self, key):
+    '''
+    returns (outKnownTrue, outUnknown, accessed) like EAtomEvaluator.evaluate or None
+    '''
+    with self.lock:
+      row = self.db.execute('SELECT value FROM eatomcache WHERE key = ?', (key,)).fetchone()
+    if row is None:
+      return None
+    outKnownTrue, outUnknown, accessed = json.loads(row[0])
+    parse = clingo.parse_term
+    outKnownTrue = [ tuple([ parse(x) for x in t ]) for t in outKnownTrue ]
+    outUnknown = [ tuple([ parse(x) for x in t ]) for t in outUnknown ]
+    if accessed is not None:
+      accessed = frozenset([ parse(x) for x in accessed ])
+    return outKnownTrue, outUnknown, accessed
+
+  def put(self, key, result):
+    outKnownTrue, outUnknown, accessed = result
+    value = json.dumps([
+      [ [ str(x) for x in t ] for t in outKnownTrue ],
+      [ [ str(x) for x in t ] for t in outUnknown ],
+      None if accessed is None else sorted([ str(x) for x in accessed ]) ])
+    with self.lock:
+      self.db.execute('INSERT OR REPLACE INTO eatomcache (key, value) VALUES (?, ?)', (key, value))
+      self.uncommitted += 1
+      if self.uncommitted >= self.COMMIT_INTERVAL:
+        self.db.commit()
+        self.uncommitted = 0
+
+  def close(self):
+    with self.lock:
+      if self.db is not None:
+        self.db.commit()
+        self.db.close()
+        self.db = None
@@ -19,6 +19,7 @@
 
 import pprint
 import logging
+import collections
 
 # the . module is called hexlite but we cannot import it, so we use the common trick in hexlite/__init__.py
 # see https://stackoverflow.com/questions/3078927/python-how-to-access-variable-declared-in-parent-module
@@ -39,27 +40,76 @@ class ProgramRewriter:
     self.config = config
     self.facts = []
     self.rewritten = []
+    # GroundingStrata (None = no external atoms are evaluated in grounding)
+    self.strata = None
+    # program part of the rules that are currently added (see GroundingStrata)
+    self.part = 'base'
+    # key = program part, value = list of rewritten rules
+    self.partRules = collections.defaultdict(list)
 
   def rewrite(self):
     '''
     returns rewritten_program, facts
+
+    with more than one evaluation unit (see EvaluationGraph),
+    the rewritten units are stored in pcontext.evaluationUnits
+    and rewritten_program contains the rules of all units
     '''
     srprog, self.facts = self.__annotateWithStatementRewriters(self.shallowprog)
+    units = [ (srprog, set()) ]
+    if self.config.evaluation_units:
+      units = EvaluationGraph(srprog).units()
+    if len(units) == 1:
+      self.rewritten, self.pcontext.groundingParts = self.rewriteUnit(srprog)
+      return self.rewritten, self.facts
+    allrewritten = []
+    for idx, (statements, exports) in enumerate(units):
+      rewritten, parts = self.rewriteUnit(statements)
+      logging.info("evaluation unit %d exports predicates %s", idx, sorted(exports))
+      self.pcontext.evaluationUnits.append(hexlite.EvaluationUnit(rewritten, parts, exports))
+      allrewritten += rewritten
+    self.rewritten = allrewritten
+    return self.rewritten, self.facts
+
+  def rewriteUnit(self, statements):
+    '''
+    rewrites annotated statements
+    returns rewritten_program, program parts for grounding
+    '''
+    self.strata = None
+    if self.config.ground_evaluation:
+      strata = GroundingStrata(statements)
+      if strata.evaluatesInGrounding():
+        self.strata = strata
     self.rewritten = []
+    self.part = 'base'
+    self.partRules = collections.defaultdict(list)
     # rewriters append to self.rewritten
-    for stm in srprog:
+    for stm in statements:
+      if self.strata is not None:
+        self.part = self.strata.partOf(stm)
       stm.rewrite()
+    self.part = 'base'
     if not self.pcontext.wroteMaxint and self.config.maxint is not None:
       maxintConst = shp.alist(['#const', Aux.MAXINT, '=', self.config.maxint], right='.')
       logging.info("adding maxint rule (from commandline) "+shp.shallowprint(maxintConst))
       self.addRewrittenRule(maxintConst)
-    return self.rewritten, self.facts
+    if self.strata is None:
+      return self.rewritten, ['base']
+    parts = self.strata.parts()
+    rewritten = self.partRules['base']
+    for part in parts[1:]:
+      rewritten.append(shp.alist([['#program', part]], right='.'))
+      rewritten += self.partRules[part]
+    logging.info("grounding program parts %s", parts)
+    return rewritten, parts
 
   def addRewrittenRule(self, stm):
     'called by child statement rewriters to register rules'
     # XXX handle duplicate rules here
     logging.info("adding rewritten rule "+shp.shallowprint(stm))
     self.rewritten.append(stm)
+    self.partRules[self.part].append(stm)
 
   def __annotateWithStatementRewriters(self, shallowprog):
     '''
@@ -267,6 +317,392 @@ class PregroundableOutputEAtomHandler(EAtomHandlerBase):
 
     return out
 
+def isIdentifier(x):
+  # constant or predicate name (possibly with strong negation) in the shallow parse
+  return isinstance(x, str) and x != 'not' and (x[0].islower() or (len(x) > 1 and x[0] == '-' and x[1].islower()))
+
+def headPredicates(head):
+  '''
+  returns the set of predicates in the head (shallow parse)
+  '''
+  pred = simpleAtomPredicate(head)
+  if pred is not None:
+    return set([pred])
+  if isinstance(head, list) and not isinstance(head, shp.alist):
+    # disjunction 'a(X) v b(X)' is parsed as ['a', alist('(' ...), 'v', 'b', alist('(' ...)]
+    # ('v' is a separator only between atoms, it can also be a predicate)
+    preds = set()
+    idx = 0
+    while idx < len(head) and isIdentifier(head[idx]):
+      preds.add(head[idx])
+      idx += 1
+      if idx < len(head) and isinstance(head[idx], shp.alist) and head[idx].left == '(':
+        idx += 1
+      if idx == len(head):
+        return preds
+      if head[idx] not in ['v', '|']:
+        break
+      idx += 1
+  # choice or not understood (conservative)
+  return set(ast.deepCollect(head, isIdentifier))
+
+def simpleAtomPredicate(x):
+  '''
+  returns the predicate if x is the shallow parse of a single atom, otherwise None
+  '''
+  if isinstance(x, list) and not isinstance(x, shp.alist) and len(x) in [1, 2] and isIdentifier(x[0]):
+    if len(x) == 1 or (isinstance(x[1], shp.alist) and x[1].left == '('):
+      return x[0]
+  return None
+
+def predicateInputs(holder, inputs):
+  '''
+  returns the list of predicates given to predicate inputs of holder in inputs (shallow parse)
+  or None if some predicate input is not a constant
+  '''
+  ret = []
+  for spec, inp in zip(holder.inspec, inputs):
+    if spec == dlvhex.PREDICATE:
+      if not isinstance(inp, list) or len(inp) != 1 or not isIdentifier(inp[0]):
+        return None
+      ret.append(inp[0])
+  return ret
+
+class GroundingStrata:
+  '''
+  dependency analysis that finds predicates whose extension is determined in grounding
+  (they are defined by facts and by stratified normal rules that depend only on such predicates)
+
+  external atoms whose predicate inputs are all such predicates are evaluated in grounding
+  (PureInstantiationEAtomHandler) instead of being guessed and verified during search
+
+  for this, the program is grounded in parts (multi-shot grounding):
+  * part 'base' contains directives and rules of determined predicates that do not depend on external atoms
+  * part Aux.STRATUM+str(n) contains rules of determined predicates whose rules use external atoms
+    with predicate inputs from lower parts (n = 1 + maximum part of these predicate inputs)
+  * the last part contains all other rules (they can use external atoms evaluated in grounding, too)
+
+  the analysis is conservative: every statement that is not understood makes predicates non-determined
+  '''
+  class Dependencies:
+    # dependencies of the body of one rule
+    def __init__(self):
+      # predicates in positive literals
+      self.positive = set()
+      # predicates in negative literals, aggregates, and other non-atomic elements
+      self.negative = set()
+      # predicate inputs of external atoms
+      self.external = set()
+
+  def __init__(self, statements):
+    # key = predicate, value = list of Dependencies (one for each defining rule or fact)
+    self.rules = collections.defaultdict(list)
+    # predicates defined by statements that are not facts or normal rules (or that are not understood)
+    self.nondetermined = set()
+    # external atoms as (holder, shallow parse of inputs)
+    self.eatoms = []
+    for stm in statements:
+      self.addStatement(stm)
+    # key = predicate, value = number of the part for grounding (only for determined predicates)
+    self.levels = self.computeLevels()
+    # part for all other rules
+    self.lastLevel = max(self.levels.values(), default=0) + 1
+    logging.info("GS determined predicates with levels %s", self.levels)
+
+  def addStatement(self, stm):
+    if isinstance(stm, StatementRewriterHash):
+      return
+    if isinstance(stm, StatementRewriterWeakCstr):
+      self.analyzeBody(stm.statement[1])
+    elif isinstance(stm, StatementRewriterRuleCstr):
+      deps = self.analyzeBody(stm.statement[1])
+      self.addDefinition(stm.statement[0], deps)
+    elif isinstance(stm, StatementRewriterHead):
+      self.addDefinition(stm.statement[0], self.Dependencies())
+    else:
+      # we do not know what this defines
+      self.nondetermined |= set(ast.deepCollect(stm.statement, isIdentifier))
+
+  def addDefinition(self, head, deps):
+    if head is None:
+      # constraint
+      return
+    pred = simpleAtomPredicate(head)
+    if pred is None:
+      # disjunctive or choice head
+      self.nondetermined |= headPredicates(head)
+      return
+    if deps is None:
+      self.nondetermined.add(pred)
+      return
+    self.rules[pred].append(deps)
+
+  def analyzeBody(self, body):
+    '''
+    returns Dependencies of body or None if the body cannot be analyzed
+    '''
+    deps = self.Dependencies()
+    analyzable = True
+    for elem in body:
+      if isinstance(elem, shp.alist) or not isinstance(elem, list):
+        # disjunction or conditional literal
+        deps.negative |= set(ast.deepCollect(elem, isIdentifier))
+        continue
+      idx = 0
+      while idx < len(elem) and elem[idx] == 'not':
+        idx += 1
+      lit = elem[idx:]
+      if len(lit) > 0 and isinstance(lit[0], str) and lit[0].startswith('&'):
+        holder = dlvhex.eatoms.get(lit[0][1:], None)
+        inplist = [ x for x in lit if isinstance(x, shp.alist) and x.left == '[' ]
+        inputs = list(inplist[0]) if len(inplist) > 0 else []
+        preds = None if holder is None else predicateInputs(holder, inputs)
+        if preds is None or (idx > 0 and len(preds) > 0):
+          # (negated external atoms are not evaluated in grounding, see getExecutionHandler)
+          analyzable = False
+        else:
+          self.eatoms.append( (holder, inputs) )
+          deps.external |= set(preds)
+        continue
+      pred = simpleAtomPredicate(lit)
+      if pred is not None and idx == 0:
+        deps.positive.add(pred)
+      elif pred is not None:
+        deps.negative.add(pred)
+      elif len(ast.deepCollect(elem, lambda x: isinstance(x, str) and x.startswith('&'))) > 0:
+        # external atom in aggregate (not supported by the rewriting)
+        analyzable = False
+      else:
+        # aggregate, comparison, ...
+        deps.negative |= set(ast.deepCollect(elem, isIdentifier))
+    if not analyzable:
+      return None
+    return deps
+
+  def computeLevels(self):
+    '''
+    processes strongly connected components of the predicate dependency graph (dependencies first)
+    returns dictionary from determined predicates to levels
+    '''
+    levels = {}
+    for component in self.components():
+      determined = not any([ p in self.nondetermined for p in component ])
+      level = 0
+      for p in component:
+        for deps in self.rules.get(p, []):
+          for q in deps.positive | deps.negative | deps.external:
+            if q in component:
+              # recursion through negation or through external atoms is not stratified
+              if q not in deps.positive:
+                determined = False
+            elif q not in levels:
+              determined = False
+            else:
+              level = max(level, levels[q] + (1 if q in deps.external else 0))
+      if determined:
+        for p in component:
+          levels[p] = level
+    return levels
+
+  def components(self):
+    # strongly connected components (Tarjan's algorithm) in the order of dependencies
+    index, lowlink, stack, onstack, ret = {}, {}, [], set(), []
+    def dependencies(p):
+      for deps in self.rules.get(p, []):
+        yield from deps.positive | deps.negative | deps.external
+    def visit(p):
+      index[p] = lowlink[p] = len(index)
+      stack.append(p)
+      onstack.add(p)
+      for q in dependencies(p):
+        if q not in index:
+          visit(q)
+          lowlink[p] = min(lowlink[p], lowlink[q])
+        elif q in onstack:
+          lowlink[p] = min(lowlink[p], index[q])
+      if lowlink[p] == index[p]:
+        component = set()
+        while True:
+          q = stack.pop()
+          onstack.discard(q)
+          component.add(q)
+          if q == p:
+            break
+        ret.append(component)
+    for p in list(self.rules.keys()) + list(self.nondetermined):
+      if p not in index:
+        visit(p)
+    return ret
+
+  def evaluatesInGrounding(self, holder=None, inputs=None):
+    '''
+    whether the external atom (or some external atom in the program if holder is None) is evaluated in grounding
+    '''
+    if holder is None:
+      return any([ self.evaluatesInGrounding(h, i) for h, i in self.eatoms ])
+    preds = predicateInputs(holder, inputs)
+    return preds is not None and len(preds) > 0 and all([ p in self.levels for p in preds ])
+
+  def partName(self, level):
+    if level == 0:
+      return 'base'
+    return Aux.STRATUM+str(level)
+
+  def parts(self):
+    return [ self.partName(level) for level in range(0, self.lastLevel+1) ]
+
+  def partOf(self, stm):
+    '''
+    returns the program part of the rules rewritten from stm
+    '''
+    if isinstance(stm, StatementRewriterHash):
+      return 'base'
+    if isinstance(stm, StatementRewriterHead) and not isinstance(stm, StatementRewriterWeakCstr):
+      pred = simpleAtomPredicate(stm.statement[0])
+      if pred in self.levels:
+        return self.partName(self.levels[pred])
+    return self.partName(self.lastLevel)
+
+class EvaluationGraph:
+  '''
+  splits a program into a chain of evaluation units (as in the evaluation graph of dlvhex2)
+
+  * the predicate dependency graph has edges from head predicates to body predicates
+    (ordinary edges) and to predicate inputs of external atoms in the body (external edges)
+    (predicates in one head and constraints are handled like mutually dependent predicates)
+  * the depth of a strongly connected component of this graph is the maximum number of
+    external edges on a path to a component without dependencies
+    (external edges of constraints and external edges to determined predicates are not counted)
+  * unit n contains the rules of components with depth n
+
+  so later units depend on earlier units through external atoms (and maybe ordinary edges),
+  earlier units never depend on later units (each unit boundary is a splitting set)
+
+  units are solved one after the other, answer sets of earlier units are given to later units as facts
+  (the external atoms connecting the units are then evaluated in grounding, see GroundingStrata)
+
+  the program stays one unit if it contains weak constraints or statements that are not understood
+  '''
+  def __init__(self, statements):
+    self.statements = statements
+    # key = node (predicate or statement without head), value = set of (node, external)
+    self.edges = collections.defaultdict(set)
+    # key = index of statement, value = (node of the statement, set of nodes used by the statement)
+    self.nodes = {}
+    # whether the program can be split
+    self.splittable = True
+    for idx, stm in enumerate(statements):
+      self.addStatement(idx, stm)
+
+  def addStatement(self, idx, stm):
+    if isinstance(stm, StatementRewriterHash):
+      return
+    if isinstance(stm, StatementRewriterWeakCstr) or not isinstance(stm, StatementRewriterHead):
+      # optimization across units or unknown statement
+      self.splittable = False
+      return
+    isEAtomName = lambda x: isinstance(x, str) and x.startswith('&')
+    # (strong negation: -p and p are in the same component because of the implicit constraint)
+    node = lambda x: x.lstrip('-')
+    head = stm.statement[0]
+    heads = set()
+    if head is not None:
+      heads = headPredicates(head)
+    heads = sorted([ node(p) for p in heads ])
+    if len(heads) == 0:
+      heads = [ ('statement', idx) ]
+    uses = set()
+    body = stm.statement[1] if isinstance(stm, StatementRewriterRuleCstr) else []
+    for elem in body:
+      # external atoms (without prefix) in elem
+      eatoms = [ x[[ isEAtomName(y) for y in x ].index(True):]
+                 for x in ast.deepCollect(elem, lambda x: isinstance(x, list) and any([ isEAtomName(y) for y in x ])) ]
+      if len(eatoms) == 0:
+        pred = simpleAtomPredicate(elem[1:] if isinstance(elem, list) and len(elem) > 1 and elem[0] == 'not' else elem)
+        preds = set([pred]) if pred is not None else set(ast.deepCollect(elem, isIdentifier))
+        uses |= set([ (node(p), False) for p in preds ])
+        continue
+      for eatom in eatoms:
+        holder = dlvhex.eatoms.get(eatom[0][1:], None)
+        inplist = [ x for x in eatom if isinstance(x, shp.alist) and x.left == '[' ]
+        inputs = None if holder is None else predicateInputs(holder, list(inplist[0]) if len(inplist) > 0 else [])
+        if inputs is None:
+          self.splittable = False
+          return
+        uses |= set([ (node(p), True) for p in inputs ])
+    for h in heads:
+      self.edges[h] |= uses
+      self.edges[h] |= set([ (other, False) for other in heads if other != h ])
+    self.nodes[idx] = (heads[0], set([ p for p, _ in uses ]))
+
+  def components(self):
+    # key = node, value = component (strongly connected component, Tarjan's algorithm)
+    index, lowlink, stack, onstack, component = {}, {}, [], set(), {}
+    def visit(p):
+      index[p] = lowlink[p] = len(index)
+      stack.append(p)
+      onstack.add(p)
+      for q, _ in self.edges.get(p, ()):
+        if q not in index:
+          visit(q)
+          lowlink[p] = min(lowlink[p], lowlink[q])
+        elif q in onstack:
+          lowlink[p] = min(lowlink[p], index[q])
+      if lowlink[p] == index[p]:
+        while True:
+          q = stack.pop()
+          onstack.discard(q)
+          component[q] = p
+          if q == p:
+            break
+    for p in list(self.edges.keys()):
+      if p not in index:
+        visit(p)
+    return component
+
+  def units(self):
+    '''
+    returns list of units (statements, predicates used by later units)
+    '''
+    if not self.splittable:
+      return [ (self.statements, set()) ]
+    component = self.components()
+    # external atoms with determined inputs are evaluated in grounding anyway
+    determined = GroundingStrata(self.statements).levels
+    members = collections.defaultdict(list)
+    for p, c in component.items():
+      members[c].append(p)
+    # key = component, value = depth (the graph of components is acyclic)
+    depth = {}
+    def depthOf(c):
+      if c not in depth:
+        # (constraints stay in the unit of their inputs, in a separate unit they could not prune the search)
+        depth[c] = max([ depthOf(component[q]) + (1 if external and not isinstance(p, tuple) and q not in determined else 0)
+                         for p in members[c] for q, external in self.edges.get(p, ())
+                         if component[q] != c ], default=0)
+      return depth[c]
+    for c in members:
+      depthOf(c)
+    nodeDepth = lambda p: depth[component[p]]
+    count = max(depth.values(), default=0) + 1
+    if count == 1:
+      return [ (self.statements, set()) ]
+    # directives go into all units
+    units = [ ([], set()) for _ in range(count) ]
+    for idx, stm in enumerate(self.statements):
+      if idx in self.nodes:
+        node, uses = self.nodes[idx]
+        level = nodeDepth(node)
+        units[level][0].append(stm)
+        for p in uses:
+          if nodeDepth(p) < level:
+            units[nodeDepth(p)][1].add(p)
+      else:
+        for unit in units:
+          unit[0].append(stm)
+    logging.info("EG split program into %d evaluation units", count)
+    return units
+
 def classifyEAtomsInstallRewritingHandlers(pcontext):
   '''
   For now we can only handle the following:
@@ -283,6 +719,8 @@ def classifyEAtomsInstallRewritingHandlers(pcontext):
     external atom has only constant/tuple input(s)
     -> we transform this atom into a gringo external
     -> we do not (need to) consider it during solving
+    (this handler is also used for occurrences of external atoms
+    whose predicate inputs are determined in grounding, see GroundingStrata)
   '''
   for name, holder in dlvhex.eatoms.items():
     # uses PureInstantiationEAtomHandler if possible (even if output is 0)
@@ -444,7 +882,12 @@ class StatementRewriterRuleCstr(StatementRewriterHead):
     eatomname = eatom['name']
     if eatomname not in dlvhex.eatoms:
       raise Exception('could not find handler for external atom {}'.format(shp.shallowprint(eatom['shallow'])))
-    return dlvhex.eatoms[eatomname].executionHandler
+    holder = dlvhex.eatoms[eatomname]
+    # (gringo would expand the output of a negated external atom into several rules)
+    if self.pr.strata is not None and len(eatom['prefix']) == 0 and self.pr.strata.evaluatesInGrounding(holder, eatom['inputs']):
+      logging.info('SRRC evaluating eatom %s in grounding', shp.shallowprint(eatom['shallow']))
+      return PureInstantiationEAtomHandler(self.pr.pcontext, holder)
+    return holder.executionHandler
 
   def pickSafeExternalAtom(self, pendingEatoms, safeVars):
     '''
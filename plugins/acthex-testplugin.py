@@ -11,6 +11,9 @@ import sys
 # @persistenceUnset(atom) -> forgets atom in environment
 # &persistenceByPred[pred](atom) -> true for all atoms with predicate pred that are remembered in environment
 class PersistenceEnvironment(acthex.Environment): 
+  # modifications are reported with changed('persistence')
+  tracksChanges = True
+
   def __init__(self):
     self.atoms = set([ ('init',) ])
 
@@ -24,6 +27,7 @@ class PersistenceEnvironment(acthex.Environment):
       self.atoms.add(self.strtuple_of_atom(atom))
     else:
       self.atoms.remove(self.strtuple_of_atom(atom))
+    self.changed('persistence')
 
 def persistenceSet(atom):
   assert(isinstance(atom, acthex.ID))
@@ -55,6 +59,9 @@ def persistenceByPred(pred):
 # &sortVal(idx,val) -> provide integer pairs: index/value
 
 class SortEnvironment(acthex.Environment): 
+  # modifications are reported with changed('sort')
+  tracksChanges = True
+
   def __init__(self):
     self.sequence = [2, 1, 3, 2, 6, 3, 5]
 
@@ -62,6 +69,7 @@ class SortEnvironment(acthex.Environment):
     assert(isinstance(i, int))
     assert(isinstance(j, int))
     self.sequence[i], self.sequence[j] = self.sequence[j], self.sequence[i]
+    self.changed('sort')
 
   def display(self):
     MAX = len(self.sequence)
@@ -102,11 +110,16 @@ def register():
 
   acthex.addAction('persistenceSet', (acthex.CONSTANT,))
   acthex.addAction('persistenceUnset', (acthex.CONSTANT,))
-  acthex.addAtom('persistenceByPred', (acthex.CONSTANT,), 1)
+  prop = acthex.ExtSourceProperties()
+  prop.setReadsEnvironment(['persistence'])
+  acthex.addAtom('persistenceByPred', (acthex.CONSTANT,), 1, prop)
 
   acthex.addAction('sortSwap', (acthex.CONSTANT, acthex.CONSTANT))
-  acthex.addAction('sortDisplay', ())
-  acthex.addAtom('sortVal', (), 2)
+  # (several lines of output must not be interleaved with other actions)
+  acthex.addAction('sortDisplay', (), parallel=False)
+  prop = acthex.ExtSourceProperties()
+  prop.setReadsEnvironment(['sort'])
+  acthex.addAtom('sortVal', (), 2, prop)
 
   acthex.addAction('printLine', (acthex.TUPLE,))
 
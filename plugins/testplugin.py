@@ -3,7 +3,7 @@ import dlvhex
 import hexlite.ast.shallowparser as shp
 from hexlite.modelcallback import JSONModelCallback
 
-import logging, sys
+import logging, sys, asyncio
 
 def id(p):
 	for x in dlvhex.getTrueInputAtoms():
@@ -297,6 +297,12 @@ def someSelectedPartial(selected):
 	if unknown:
 		dlvhex.outputUnknown(())
 
+# partial evaluation with scheduling (see register())
+someSelectedPartialThrottled = someSelectedPartial
+partialTestLevels = partialTest
+# deterministic (results can be stored with --persistent-cache)
+partialTestDeterministic = partialTest
+
 def someSelectedLearning(selected):
 	for x in dlvhex.getInputAtoms():
 		if x.tuple()[0] == selected and x.isTrue():
@@ -341,17 +347,40 @@ def secondArgByFirstArgMoreLearning(predicate, first_arg):
 
 def testSetMinus(p, q):
 	# is true for all constants in extension of p but not in extension of q
-	pset, qset = set(), set()
-	for x in dlvhex.getTrueInputAtoms():
-		tup = x.tuple()
-		if tup[0].value() == p.value():
-			pset.add(tup[1].value())
-		elif tup[0].value() == q.value():
-			qset.add(tup[1].value())
+	interpretation = dlvhex.getInterpretation()
+	pset = set([ args[0].value() for args in interpretation.true(p) ])
+	qset = set([ args[0].value() for args in interpretation.true(q) ])
 	rset = pset - qset
 	for r in rset:
 		dlvhex.output( (r,) )
 
+# testSetMinus with a decision hint (see register())
+testSetMinusHinted = testSetMinus
+
+def setMinusHint(inputs, outputs):
+	# guess that elements with alphabetically small names are not in the set difference
+	if outputs[0].value() < 'c':
+		return 0.2
+	return None
+
+async def testSetMinusAsync(p, q):
+	# like testSetMinus, but asynchronous (evaluations of several input tuples overlap)
+	await asyncio.sleep(0)
+	testSetMinus(p, q)
+
+def testSquares(n):
+	# pairs (i, i*i) for 0 <= i < n as column-oriented bulk output
+	numbers = list(range(n.intValue()))
+	dlvhex.outputManyIntegers(columns=[numbers, [ i*i for i in numbers ]])
+
+def testCopyMany(p):
+	# extension of unary predicate p as bulk output of constants
+	dlvhex.outputManyConstants(dlvhex.getInterpretation().true(p))
+
+def testStringOf(c):
+	# the constant c as a string (declared output type STRING, so no quotes are needed)
+	dlvhex.output( (c.value(),) )
+
 def testSetMinusLearn(p, q):
 	# is true for all constants in extension of p but not in extension of q
 	# (same as testSetMinus)
@@ -453,7 +482,7 @@ def register(arguments=None):
 	#unused dlvhex.addAtom("testListHalf", (dlvhex.CONSTANT,), 2)
 	#unused dlvhex.addAtom("testListMerge", (dlvhex.CONSTANT,dlvhex.CONSTANT,dlvhex.CONSTANT), 2)
 	dlvhex.addAtom("testSubstr", (dlvhex.CONSTANT,dlvhex.CONSTANT,dlvhex.CONSTANT), 1)
-	dlvhex.addAtom("testStrlen", (dlvhex.CONSTANT,), 1)
+	dlvhex.addAtom("testStrlen", (dlvhex.CONSTANT,), 1, outargumenttypes=(dlvhex.INTEGER,))
 	dlvhex.addAtom("testSmallerThan", (dlvhex.CONSTANT,dlvhex.CONSTANT), 0)
 	dlvhex.addAtom("testEven", (dlvhex.PREDICATE,dlvhex.PREDICATE), 0)
 	#unused dlvhex.addAtom("testOdd", (dlvhex.PREDICATE,dlvhex.PREDICATE), 0)
@@ -463,8 +492,20 @@ def register(arguments=None):
 	#XFAIL partial dlvhex.addAtom("idp", (dlvhex.PREDICATE,), 1)
 	dlvhex.addAtom("idc", (dlvhex.CONSTANT,), 1)
 	#TODO testCautiousQuery
-	dlvhex.addAtom("testSetMinus", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1)
+	prop = dlvhex.ExtSourceProperties()
+	prop.setDeterministic(True)
+	prop.setThreadSafe(True)
+	prop.addMonotonicInputPredicate(0)
+	prop.addAntimonotonicInputPredicate(1)
+	dlvhex.addAtom("testSetMinus", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1, prop)
 	dlvhex.addAtom("testSetMinusLearn", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1)
+	prop = dlvhex.ExtSourceProperties()
+	prop.setDecisionHint(setMinusHint)
+	dlvhex.addAtom("testSetMinusHinted", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1, prop)
+	dlvhex.addAtom("testSetMinusAsync", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1)
+	dlvhex.addAtom("testSquares", (dlvhex.CONSTANT,), 2)
+	dlvhex.addAtom("testCopyMany", (dlvhex.PREDICATE,), 1)
+	dlvhex.addAtom("testStringOf", (dlvhex.CONSTANT,), 1, outargumenttypes=(dlvhex.STRING,))
 
 	dlvhex.addAtom("testNonmon", (dlvhex.PREDICATE,), 1)
 	dlvhex.addAtom("testNonmon2", (dlvhex.PREDICATE,), 1)
@@ -495,12 +536,27 @@ def register(arguments=None):
 	prop.setProvidesPartialAnswer(True)
 	dlvhex.addAtom("partialTest", (dlvhex.PREDICATE, ), 0, prop)
 
+	prop = dlvhex.ExtSourceProperties()
+	prop.setProvidesPartialAnswer(True)
+	prop.setPartialEvaluationDecisionLevels(range(0, 4))
+	dlvhex.addAtom("partialTestLevels", (dlvhex.PREDICATE, ), 0, prop)
+
+	prop = dlvhex.ExtSourceProperties()
+	prop.setProvidesPartialAnswer(True)
+	prop.setDeterministic(True)
+	dlvhex.addAtom("partialTestDeterministic", (dlvhex.PREDICATE, ), 0, prop)
+
 	# someSelected and variations
 	dlvhex.addAtom("someSelected", (dlvhex.PREDICATE,), 0)
 	dlvhex.addAtom("someSelectedLearning", (dlvhex.PREDICATE,), 0)
 	prop = dlvhex.ExtSourceProperties()
 	prop.setProvidesPartialAnswer(True)
 	dlvhex.addAtom("someSelectedPartial", (dlvhex.PREDICATE,), 0, prop)
+	prop = dlvhex.ExtSourceProperties()
+	prop.setProvidesPartialAnswer(True)
+	prop.setPartialEvaluationThreshold(5)
+	prop.setPartialEvaluationBackoff(8)
+	dlvhex.addAtom("someSelectedPartialThrottled", (dlvhex.PREDICATE,), 0, prop)
 
 	dlvhex.addAtom("secondArgByFirstArg", (dlvhex.PREDICATE, dlvhex.CONSTANT), 1)
 	dlvhex.addAtom("secondArgByFirstArgMoreLearning", (dlvhex.PREDICATE, dlvhex.CONSTANT), 1)
@@ -514,6 +570,7 @@ def register(arguments=None):
 
 	prop = dlvhex.ExtSourceProperties()
 	prop.addFiniteOutputDomain(0)
+	prop.setDeterministic(True)
 	dlvhex.addAtom("testConcat", (dlvhex.TUPLE,), 1, prop)
 
 	dlvhex.addAtom("functionCompose", (dlvhex.TUPLE,), 1)
@@ -14,14 +14,23 @@ logging.basicConfig(
 INPUTDIR='./inputs/'
 
 class BubbleSortTestcase(unittest.TestCase):
-  def my_run(self, hexfile):
-    params = os.path.join(INPUTDIR, hexfile)
+  def my_run(self, hexfile, args=''):
+    params = args+' '+os.path.join(INPUTDIR, hexfile)
     return subprocess.run('acthex --pluginpath=../plugins --plugin=acthex-testplugin '+params,
                           shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf8')
 
   def test_persistenceenv(self):
+    self.check_persistenceenv('')
+
+  def test_persistenceenv_incremental(self):
+    self.check_persistenceenv('--incremental')
+
+  def test_persistenceenv_concurrent(self):
+    self.check_persistenceenv('--action-threads=4')
+
+  def check_persistenceenv(self, args):
     hexfile = 'acthex_bubblesort_persistenceenv.hex'
-    proc = self.my_run(hexfile)
+    proc = self.my_run(hexfile, args)
     for line in proc.stderr.split('\n'):
       logging.debug("E: %s", line.rstrip())
     self.assertEqual(proc.stderr, '')
@@ -36,8 +45,14 @@ class BubbleSortTestcase(unittest.TestCase):
     self.assertEqual([int(x) for x in integers], [1, 2, 2, 3, 3, 5, 6])
 
   def test_sortenv(self):
+    self.check_sortenv('')
+
+  def test_sortenv_incremental(self):
+    self.check_sortenv('--incremental')
+
+  def check_sortenv(self, args):
     hexfile = 'acthex_bubblesort_sortenv.hex'
-    proc = self.my_run(hexfile)
+    proc = self.my_run(hexfile, args)
     for line in proc.stderr.split('\n'):
       logging.debug("E: %s", line.rstrip())
     self.assertEqual(proc.stderr, '')
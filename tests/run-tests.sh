@@ -34,6 +34,8 @@ JAVAAPI_CLASSPATH="../java-api/target/classes"
 #     (procedure as with ".stderr" only that standard output is verified
 # * the rest of the input line are parameters used for executing dlvhex
 #   e.g.: [--nofact -ra] (without square brackets)
+#   @TMPDIR@ in the parameters is replaced by a directory that is created empty for each run of this script
+#   (e.g., for files that several testcases share, such as [--persistent-cache=@TMPDIR@/cache.sqlite])
 #
 
 #
@@ -70,6 +72,7 @@ ANSWERSETCOMPARE=./answerset_compare.py
 MKTEMP="mktemp -t tmp.XXXXXXXXXX"
 TMPFILE=$($MKTEMP) # global temp. file for answer sets
 ETMPFILE=$($MKTEMP) # global temp. file for errors
+TESTTMPDIR=$($MKTEMP -d) # global temp. directory for files shared by testcases (@TMPDIR@)
 
 passed=0
 failed=0
@@ -96,6 +99,8 @@ do
 
     let ntests++
 
+    ADDPARM=${ADDPARM//@TMPDIR@/$TESTTMPDIR}
+
     # check if we have the input file
     if test ${HEXPROGRAM:0:1} != "/"; then
         HEXPROGRAM=$EXAMPLESDIR/$HEXPROGRAM
@@ -213,6 +218,7 @@ done
 # cleanup
 rm -f $TMPFILE
 rm -f $ETMPFILE
+rm -rf $TESTTMPDIR
 
 echo ========== dlvhex tests completed ==========
 